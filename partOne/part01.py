@@ -4,7 +4,12 @@ IZV cast1 projektu
 Autor: xhejni00
 """
 from bs4 import BeautifulSoup
-import requests
+import aiohttp
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
 import numpy as np
 from numpy.typing import NDArray
 import matplotlib.pyplot as plt
@@ -169,15 +174,129 @@ def generate_sinus(show_figure: bool = False, save_path: str | None = None):
         plt.savefig(f'{save_path}')
 
 
-def download_data() -> Dict[str, List[Any]]:
+#URL obtained from manually digging through the website
+STATIONS_URL = 'https://ehw.fit.vutbr.cz/izv/st_zemepis_cz'
 
-    #URL obtained from manually digging through the website
-    url = 'https://ehw.fit.vutbr.cz/izv/st_zemepis_cz'
-    page = requests.get(url)
-    page.encoding = 'utf-8'
 
-    #Parse the page using BeautifulSoup and utf-8 encoding
-    soup = BeautifulSoup(page.text, 'html.parser')
+def _cache_paths(cache_dir: str, url: str) -> tuple[str, str]:
+    """Cache paths
+    Returns paths to the cached body and its metadata (ETag, Last-Modified) for the given URL
+
+    :param cache_dir: Directory with cached responses
+    :param url: URL of the page
+    :return: Tuple with path to the body and path to the JSON metadata
+    """
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f'{key}.html'), os.path.join(cache_dir, f'{key}.json')
+
+
+def _write_file(path: str, data: bytes):
+    """Write file
+    Writes data to a unique temporary file first and then replaces the file,
+    so readers never see a partially written file and concurrent writers do not collide
+
+    :param path: Path to the file
+    :param data: Content of the file
+    """
+    handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+async def _fetch(session: aiohttp.ClientSession, url: str, cache_dir: str | None) -> str:
+    """Fetch page
+    Downloads the page, cached pages are revalidated with a conditional request
+    and served from the cache if the server answers 304 Not Modified
+
+    :param session: Shared client session
+    :param url: URL of the page
+    :param cache_dir: Directory with cached responses, if None the cache is not used
+    :return: Text of the page
+    """
+    headers = {}
+
+    #Send validators of the cached response so unchanged page is not downloaded again
+    if cache_dir is not None:
+        body_path, meta_path = _cache_paths(cache_dir, url)
+        if os.path.exists(body_path) and os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+    async with session.get(url, headers=headers) as response:
+
+        #Page did not change, use the cached body
+        if response.status == 304 and headers:
+            with open(body_path, 'rb') as f:
+                return f.read().decode('utf-8')
+
+        #Any other answer than the whole page is an error (e.g. 304 for a page which is not cached)
+        if response.status != 200:
+            raise aiohttp.ClientResponseError(response.request_info, response.history, status=response.status,
+                                              message=response.reason, headers=response.headers)
+        body = await response.read()
+
+        #Store body and validators for the next requests
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            _write_file(body_path, body)
+            meta = {
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+            _write_file(meta_path, json.dumps(meta).encode('utf-8'))
+
+    return body.decode('utf-8')
+
+
+async def _fetch_all(urls: List[str], cache_dir: str | None, connections: int, timeout: float) -> List[str]:
+    """Fetch pages
+    Downloads all pages concurrently using one session with a pool of connections
+
+    :param urls: URLs of the pages
+    :param cache_dir: Directory with cached responses, if None the cache is not used
+    :param connections: Maximal number of open connections
+    :param timeout: Total timeout of one request in seconds
+    :return: List with text of each page in the order of the URLs
+    """
+    connector = aiohttp.TCPConnector(limit=connections)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        return await asyncio.gather(*(_fetch(session, url, cache_dir) for url in urls))
+
+
+def fetch_pages(urls: List[str], cache_dir: str | None = None, connections: int = 8,
+                timeout: float = 30) -> List[str]:
+    """Fetch pages
+    Downloads several pages (e.g. station pages) concurrently, see _fetch for the caching
+
+    :param urls: URLs of the pages
+    :param cache_dir: Directory with cached responses, if None the cache is not used
+    :param connections: Maximal number of open connections
+    :param timeout: Total timeout of one request in seconds
+    :return: List with text of each page in the order of the URLs
+    """
+    return asyncio.run(_fetch_all(urls, cache_dir, connections, timeout))
+
+
+def _parse_stations(html: str) -> Dict[str, List[Any]]:
+    """Parse stations
+    Extracts positions, latitudes, longitudes and heights of the stations from the page
+
+    :param html: Text of the page with the stations table
+    :return: Dictionary with positions, lats, longs and heights lists
+    """
+
+    #Parse the page using BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
 
     #Define the dictionary that will hold the data
     dict = {
@@ -209,6 +328,17 @@ def download_data() -> Dict[str, List[Any]]:
 
     return dict
 
+
+def download_data(url: str = STATIONS_URL, cache_dir: str | None = None) -> Dict[str, List[Any]]:
+    """Download data
+    Downloads the page with the stations and extracts their positions, coordinates and heights
+
+    :param url: URL of the page with the stations
+    :param cache_dir: Directory with cached responses, if None the cache is not used
+    :return: Dictionary with positions, lats, longs and heights lists
+    """
+    return _parse_stations(fetch_pages([url], cache_dir)[0])
+
 if __name__ == "__main__":
     distance(np.array([[-1, -1, -1], [0, 1, 2], [3, -3, 1], [-2, -2, 0], [4, 5, 6]]), np.array([[1, 1, 1], [0, 0, 0], [3, 3, 3], [-2, 1, 2], [0, 0, 0]]))
     generate_graph([7,4,3], False, 'generate_graph.png')
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Testy stahovani dat z IZV casti 1 proti lokalnimu HTTP serveru
+Autor: xhejni00
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import pytest
+
+import part01
+
+#Page with two stations in the same format as the real page
+STATIONS_PAGE = '''<html><body><table>
+<tr class="nezvyraznit"><td><strong>Brno</strong></td><td></td><td>49,1600°</td><td></td><td>16,6000°</td><td></td><td>241,0</td></tr>
+<tr class="nezvyraznit"><td><strong>Praha</strong></td><td></td><td>50,0800°</td><td></td><td>14,4200°</td><td></td><td>365,5</td></tr>
+</table></body></html>'''.encode('utf-8')
+
+ETAG = '"stations-v1"'
+
+
+class StationsHandler(BaseHTTPRequestHandler):
+    """Stand-in server of the station pages, answers 304 if the ETag matches"""
+
+    def do_GET(self):
+        server = self.server
+
+        #Record the request and the number of requests handled at the same time
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers)))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+
+        try:
+            #Slow responses make concurrent requests overlap
+            time.sleep(server.delay)
+
+            if self.path == '/broken':
+                self.send_response(304)
+                self.end_headers()
+            elif self.headers.get('If-None-Match') == ETAG:
+                self.send_response(304)
+                self.send_header('ETag', ETAG)
+                self.end_headers()
+            else:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(STATIONS_PAGE)))
+                self.send_header('ETag', ETAG)
+                self.end_headers()
+                self.wfile.write(STATIONS_PAGE)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StationsHandler)
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.active = 0
+    httpd.max_active = 0
+    httpd.delay = 0
+
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server, path='/stations'):
+    return f'http://127.0.0.1:{server.server_address[1]}{path}'
+
+
+def test_first_fetch_stores_body_and_etag(server, tmp_path):
+    data = part01.download_data(url(server), cache_dir=str(tmp_path))
+
+    assert data['positions'] == ['Brno', 'Praha']
+    assert data['lats'] == [49.16, 50.08]
+    assert data['longs'] == [16.6, 14.42]
+    assert data['heights'] == [241.0, 365.5]
+
+    body_path, meta_path = part01._cache_paths(str(tmp_path), url(server))
+    with open(body_path, 'rb') as f:
+        assert f.read() == STATIONS_PAGE
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        assert json.load(f)['etag'] == ETAG
+
+
+def test_second_fetch_is_served_from_cache(server, tmp_path):
+    first = part01.fetch_pages([url(server)], cache_dir=str(tmp_path))
+    second = part01.fetch_pages([url(server)], cache_dir=str(tmp_path))
+
+    #Second request is conditional and the server answers 304 without a body
+    assert 'If-None-Match' not in server.requests[0][1]
+    assert server.requests[1][1]['If-None-Match'] == ETAG
+    assert second == first == [STATIONS_PAGE.decode('utf-8')]
+
+
+def test_fetch_without_cache_sends_no_validators(server):
+    part01.fetch_pages([url(server)])
+    part01.fetch_pages([url(server)])
+
+    assert all('If-None-Match' not in headers for _, headers in server.requests)
+
+
+def test_pages_are_fetched_concurrently(server, tmp_path):
+    server.delay = 0.3
+    urls = [url(server, f'/stations/{index}') for index in range(4)]
+
+    pages = part01.fetch_pages(urls, cache_dir=str(tmp_path))
+
+    assert pages == [STATIONS_PAGE.decode('utf-8')] * 4
+    assert server.max_active > 1
+    assert len(os.listdir(tmp_path)) == 8
+
+
+def test_not_modified_without_cache_is_error(server, tmp_path):
+    with pytest.raises(aiohttp.ClientResponseError):
+        part01.fetch_pages([url(server, '/broken')], cache_dir=str(tmp_path))
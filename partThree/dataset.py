@@ -0,0 +1,194 @@
+#!/usr/bin/env python3.12
+# coding=utf-8
+# Author: Samuel Hejnicek, xhejni00
+
+import os
+import glob
+import shutil
+import pandas as pd
+import pyarrow.feather
+from shared import atomic_write, decode_dates
+
+# Key of the partition with rows whose date can not be decoded
+MISSING_MONTH = 'none'
+
+
+def convert_pickle(path: str) -> str:
+    """
+    Convert gzip pickle with a dataframe to uncompressed Feather (Arrow IPC) file next to it.
+    Uncompressed file can be memory-mapped and its columns can be read separately.
+
+    :param path: path to the pickle (e.g. accidents.pkl.gz)
+    :return: path to the created Feather file (e.g. accidents.feather)
+    """
+    target = path.removesuffix('.gz').removesuffix('.pkl') + '.feather'
+
+    # Feather stores only columns, the index is reset
+    df = pd.read_pickle(path).reset_index(drop=True)
+
+    with atomic_write(target) as tmpPath:
+        df.to_feather(tmpPath, compression='uncompressed')
+
+    return target
+
+
+def dataset_path(name: str, directory: str = '.') -> str:
+    """
+    Return path to the file read by read_dataset, Feather file is preferred over the gzip pickle when present.
+
+    :param name: name of the dataset (e.g. accidents, locations, vehicles)
+    :param directory: directory with the data files
+    :return: path to the Feather file or to the gzip pickle
+    """
+    featherPath = os.path.join(directory, f'{name}.feather')
+    return featherPath if os.path.exists(featherPath) else os.path.join(directory, f'{name}.pkl.gz')
+
+
+def read_dataset(name: str, columns: list[str] = None, directory: str = '.') -> pd.DataFrame:
+    """
+    Read dataset, memory-mapped Feather file is preferred over the gzip pickle when present.
+
+    :param name: name of the dataset (e.g. accidents, locations, vehicles)
+    :param columns: list of columns to read, all columns are read if None
+    :param directory: directory with the data files
+    :return: pandas dataframe with the dataset
+    """
+    path = dataset_path(name, directory)
+
+    # Only requested columns are read from the memory-mapped file
+    if path.endswith('.feather'):
+        return pyarrow.feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+    df = pd.read_pickle(path)
+    return df if columns is None else df[columns]
+
+
+def _partition_keys(df: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
+    """
+    Return region (p4a) and year-month keys of the rows as strings used in names of the partition directories.
+    """
+    # Output of parse_data already contains decoded dates, otherwise each distinct p2a value is decoded once
+    dates = df['date'] if 'date' in df.columns else decode_dates(df['p2a'])['date']
+    months = dates.dt.strftime('%Y-%m').fillna(MISSING_MONTH)
+
+    regions = df['p4a'].astype('Int64').astype(str)
+    return regions, months
+
+
+def write_partitioned(df: pd.DataFrame, root: str) -> int:
+    """
+    Store dataframe partitioned by region and year-month (e.g. root/p4a=6/month=2023-01/part.feather).
+    Partitions contained in the dataframe are replaced, other partitions in the root are left untouched.
+
+    :param df: pandas dataframe with p4a and p2a (or date) columns, e.g. output of load_data or parse_data
+    :param root: root directory of the partitioned store
+    :return: number of written partitions
+    """
+    regions, months = _partition_keys(df)
+
+    written = 0
+    for (region, month), partDf in df.groupby([regions, months], sort=True, observed=True):
+        # Feather stores only columns, the index is reset
+        path = os.path.join(root, f'p4a={region}', f'month={month}', 'part.feather')
+        with atomic_write(path) as tmpPath:
+            partDf.reset_index(drop=True).to_feather(tmpPath, compression='uncompressed')
+        written += 1
+
+    return written
+
+
+def _matches(key: str, predicate) -> bool:
+    """
+    Check whether the partition key satisfies the predicate (None, scalar, list of values or callable).
+    """
+    if predicate is None:
+        return True
+    if callable(predicate):
+        return bool(predicate(key))
+    if isinstance(predicate, (list, tuple, set)):
+        return key in {str(value) for value in predicate}
+    return key == str(predicate)
+
+
+def _partition_dirs(directory: str, name: str) -> list[tuple[str, str]]:
+    """
+    Return sorted list of (key, path) of subdirectories named name=key in the directory.
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    return sorted((entry.name.split('=', 1)[1], entry.path) for entry in os.scandir(directory)
+                  if entry.is_dir() and entry.name.startswith(f'{name}='))
+
+
+def partition_files(root: str, region=None, month=None) -> list[str]:
+    """
+    Return paths to the partition files matching the predicates (see read_partitioned).
+
+    :param root: root directory of the partitioned store
+    :param region: predicate on the region code (p4a)
+    :param month: predicate on the year-month of the accident
+    :return: sorted list of paths to the matching partition files
+    """
+    paths = []
+    for regionKey, regionDir in _partition_dirs(root, 'p4a'):
+        if not _matches(regionKey, region):
+            continue
+
+        for monthKey, monthDir in _partition_dirs(regionDir, 'month'):
+            if _matches(monthKey, month):
+                paths.append(os.path.join(monthDir, 'part.feather'))
+
+    return paths
+
+
+def read_partitioned(root: str, region=None, month=None, columns: list[str] = None) -> pd.DataFrame:
+    """
+    Read dataset stored by write_partitioned, only partitions matching the predicates are opened.
+    Predicate is a single value, a list of values or a callable taking the key string
+    (region code, e.g. '6', or year-month, e.g. '2023-01'), None matches all partitions.
+
+    :param root: root directory of the partitioned store
+    :param region: predicate on the region code (p4a)
+    :param month: predicate on the year-month of the accident
+    :param columns: list of columns to read, all columns are read if None
+    :return: pandas dataframe with rows of the matching partitions
+    """
+    tables = [pyarrow.feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+              for path in partition_files(root, region, month)]
+
+    if not tables:
+        return pd.DataFrame(columns=columns)
+
+    # Categories may differ between partitions, concatenated columns are turned back to categories
+    categorical = [column for column in tables[0].columns if isinstance(tables[0][column].dtype, pd.CategoricalDtype)]
+    df = pd.concat(tables, ignore_index=True)
+    for column in categorical:
+        df[column] = df[column].astype('category')
+
+    return df
+
+
+def partition(name: str, root: str, directory: str = '.') -> int:
+    """
+    Replace the partitioned store of the dataset with a new one created from its data file.
+
+    :param name: name of the dataset with p4a and p2a columns (e.g. accidents)
+    :param root: root directory of the partitioned store
+    :param directory: directory with the data files
+    :return: number of written partitions
+    """
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+
+    return write_partitioned(read_dataset(name, directory=directory), root)
+
+
+if __name__ == "__main__":
+    # Convert all pickles in the current directory
+    for path in sorted(glob.glob("*.pkl.gz")):
+        print(f'{path} -> {convert_pickle(path)}')
+
+    # Accidents are partitioned by region and month, readers then open only the partitions they need
+    if os.path.exists("accidents.pkl.gz"):
+        print(f'accidents -> accidents_parts ({partition("accidents", "accidents_parts")} partitions)')
@@ -6,31 +6,95 @@ from matplotlib import pyplot as plt
 import pandas as pd
 import seaborn as sns
 import numpy as np
+from typing import Iterable
+import features
+from dataset import read_dataset
 
 
-def plot_animal_hours(df: pd.DataFrame):
+# Columns used by the statistics engine
+STATISTICS_COLUMNS = ['p8a', 'p28', 'p36', 'p19', 'p2b']
+
+# Columns of accidents with animals kept for the table of dominant categories (see create_table)
+TABLE_COLUMNS = ['p36', 'p8a', 'p19']
+
+
+def _codes(df: pd.DataFrame, column: str) -> np.ndarray:
     """
-    Create a bar plot of the number of accidents caused by animals in each hour.
+    Return values of the code column as integers, missing values are replaced by -1.
 
     :param df: pandas dataframe containing data
+    :param column: name of the column
     """
-    # Create a copy of the dataframe to avoid SettingWithCopyWarning
-    plotDf = df.copy()
+    return df[column].fillna(-1).to_numpy(dtype=np.int64)
+
+
+def compute_statistics(data: pd.DataFrame | Iterable[pd.DataFrame]) -> dict:
+    """
+    Compute all counts used in the report in a single pass over the data, only the columns
+    of accidents with animals used by the table (TABLE_COLUMNS) are copied.
+
+    :param data: pandas dataframe with all accidents or iterable of dataframes (chunks of the data),
+                 time features (see features.add_time_features) are added to them
+    :return: dictionary with numbers of accidents, arrays with counts indexed by code values
+             and dataframe with accidents with animals (animal_accidents)
+    """
+    stats = {
+        'accidents': 0,
+        'animals': 0,
+        'wild': 0,
+        # Accidents with animals by road direction (p28)
+        'road_direction': np.zeros(8, dtype=np.int64),
+        # Accidents caused by wild animals by hour
+        'hours': np.zeros(24, dtype=np.int64),
+        # Accidents caused by wild animals by animal type (p8a)
+        'wild_types': np.zeros(13, dtype=np.int64),
+    }
+    animalAccidents = []
+
+    # Single dataframe is processed as one chunk
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
 
-    # Filter out non wild animal types
-    plotDf = plotDf[plotDf['p8a'] < 13]
+    for chunk in chunks:
+        animal = _codes(chunk, 'p8a')
+        direction = _codes(chunk, 'p28')
 
-    # Filter out invalid hours (hour 25 found in the dataset)
-    plotDf = plotDf[plotDf['p2b'] < 2359]
+        # Time features are cached on the chunk, so other users of the same dataframe reuse them
+        features.add_time_features(chunk)
+        hours = chunk['hour'].to_numpy()
+        validTime = chunk['time_valid'].to_numpy()
 
-    # Extract hours from the time column
-    plotDf['time'] = plotDf['p2b'].apply(lambda t: f'{t:04d}'[:2])
+        # Masks of accidents with animals and accidents caused by wild animals
+        animals = animal > 0
+        wild = animals & (animal < 13)
 
-    # Convert the time column to an integer
-    plotDf.loc[:, 'time'] = plotDf['time'].astype(int)
+        stats['accidents'] += len(chunk)
+        stats['animals'] += np.count_nonzero(animals)
+        stats['wild'] += np.count_nonzero(wild)
 
-    # Calculate count of accidents for each hour
-    count_data = plotDf.groupby('time').size().reset_index(name='count')
+        # Count values of the code columns, values out of range are not counted
+        mask = animals & (direction >= 0) & (direction < 8)
+        stats['road_direction'] += np.bincount(direction[mask], minlength=8)
+
+        stats['hours'] += np.bincount(hours[wild & validTime], minlength=24)
+        stats['wild_types'] += np.bincount(animal[wild], minlength=13)
+
+        # Any grouping of accidents with animals can be computed from the kept columns by dominant_share
+        animalAccidents.append(chunk.loc[animals, TABLE_COLUMNS])
+
+    stats['animal_accidents'] = pd.concat(animalAccidents, ignore_index=True)
+
+    return stats
+
+
+def plot_animal_hours(stats: dict):
+    """
+    Create a bar plot of the number of accidents caused by animals in each hour.
+
+    :param stats: dictionary created by compute_statistics function
+    """
+    # Use only hours with any accident caused by wild animals
+    count_data = pd.DataFrame({'time': np.arange(24), 'count': stats['hours']})
+    count_data = count_data[count_data['count'] > 0]
 
     # Create a color palette
     palette = sns.color_palette("muted", len(count_data))
@@ -49,18 +113,12 @@ def plot_animal_hours(df: pd.DataFrame):
     plt.savefig('fig1.png')
 
 
-def plot_animal_type(df: pd.DataFrame):
+def plot_animal_type(stats: dict):
     """
     Create a pie chart of the animal types involved in accidents.
 
-    :param df: pandas dataframe containing data
+    :param stats: dictionary created by compute_statistics function
     """
-    # Create a copy of the dataframe to avoid SettingWithCopyWarning
-    plotDf = df.copy()
-
-    # Filter out non wild animal types
-    plotDf = plotDf[plotDf['p8a'] < 13]
-
     wild_animal_map = {
         1: "srnec",
         2: "jiná zvěř",
@@ -76,11 +134,9 @@ def plot_animal_type(df: pd.DataFrame):
         12: "jiná zvěř",
     }
 
-    # Map the animal type to the dataframe's new column
-    plotDf['animalType'] = plotDf['p8a'].map(wild_animal_map)
-
-    # Count occurrences of each accident type
-    accident_counts = plotDf["animalType"].value_counts()
+    # Count occurrences of each accident type, counts of animals mapped to the same type are summed
+    accident_counts = pd.Series(stats['wild_types']).groupby(wild_animal_map).sum()
+    accident_counts = accident_counts[accident_counts > 0].sort_values(ascending=False)
 
     # Create a palette
     palette = sns.color_palette("muted", len(accident_counts))
@@ -109,11 +165,49 @@ def plot_animal_type(df: pd.DataFrame):
     plt.savefig("fig2.png")
 
 
-def create_table(df_animals: pd.DataFrame):
+def dominant_from_counts(counts: pd.DataFrame, sizes: pd.Series) -> pd.DataFrame:
+    """
+    Find the most common value and its share in each group from a table of counts.
+
+    :param counts: pandas dataframe with groups as rows, values as columns and their counts
+    :param sizes: size of each group (may be larger than sum of the counts if some values are missing)
+    :return: pandas dataframe indexed by groups with count (size of the group), mode and share columns
     """
-    Create a table with aggregated data (road types, animals, daytime) for the given dataframe.
+    counts = counts.reindex(sizes.index, fill_value=0)
 
-    :param df: pandas dataframe containing data to be aggregated
+    return pd.DataFrame({
+        'count': sizes,
+        'mode': counts.idxmax(axis=1),
+        'share': counts.max(axis=1) / sizes,
+    })
+
+
+def dominant_share(df: pd.DataFrame, by: list[str], value: str) -> pd.DataFrame:
+    """
+    Compute the most common value of a column and its share in each group from a single crosstab.
+
+    :param df: pandas dataframe containing data
+    :param by: list of columns used for grouping, whole dataframe is one group if empty
+    :param value: column whose most common value is searched for
+    :return: pandas dataframe indexed by groups with count (size of the group), mode and share columns
+    """
+    # Whole dataframe is a single group if no grouping columns are given
+    keys = [df[column] for column in by] if by else [pd.Series(0, index=df.index, name='all')]
+
+    # Count occurrences of each value in each group at once
+    counts = pd.crosstab(keys, df[value])
+
+    # Size of each group includes rows with missing value as well
+    sizes = df.groupby(keys, observed=True).size()
+
+    return dominant_from_counts(counts, sizes)
+
+
+def create_table(stats: dict):
+    """
+    Create a table with aggregated data (road types, animals, daytime) for the given statistics.
+
+    :param stats: dictionary created by compute_statistics function
     """
     road_map = {
         0: "dálnice",
@@ -162,23 +256,30 @@ def create_table(df_animals: pd.DataFrame):
         7: "v noci",
     }
 
-    # Map the road type to the dataframe new column
-    df_animals['roadType'] = df_animals['p36'].map(road_map)
+    # Codes are replaced by labels, codes mapped to the same label form one category
+    df = stats['animal_accidents']
+    labels = pd.DataFrame({
+        'roadType': df['p36'].map(road_map),
+        'animal': df['p8a'].map(animal_map),
+        'visibility': df['p19'].map(visibility_map),
+    })
 
-    # Map the visibility to the dataframe new column
-    df_animals['visibility'] = df_animals['p19'].map(visibility_map)
-
-    # Map the animal type to the dataframe new column
-    df_animals['animalType'] = df_animals['p8a'].map(animal_map)
+    # Compute dominant animal and daytime with their shares for each road type
+    animals = dominant_share(labels, ['roadType'], 'animal')
+    visibility = dominant_share(labels, ['roadType'], 'visibility')
 
     # Create a table with aggregated data
-    table = df_animals.groupby('roadType').agg(
-        road_accident_counts=('roadType', 'size'),
-        dominant_animal=('animalType', lambda x: x.value_counts().idxmax()),
-        dominant_animal_percentage=('p8a', lambda x: f'{int(round(x.value_counts().max() / len(x) * 100))} %'),
-        dominant_visibility=('visibility', lambda x: x.value_counts().idxmax()),
-        dominant_visibility_percentage=('visibility', lambda x: f'{int(round(x.value_counts().max() / len(x) * 100))} %'),
-    ).reset_index()
+    table = pd.DataFrame({
+        'road_accident_counts': animals['count'],
+        'dominant_animal': animals['mode'],
+        'dominant_animal_percentage': animals['share'],
+        'dominant_visibility': visibility['mode'],
+        'dominant_visibility_percentage': visibility['share'],
+    }).reset_index()
+
+    # Format shares as percentages only for the output
+    for column in ['dominant_animal_percentage', 'dominant_visibility_percentage']:
+        table[column] = [f'{int(round(share * 100))} %' for share in table[column]]
 
     # Rename columns to use them in the report
     table.rename(
@@ -197,21 +298,20 @@ def create_table(df_animals: pd.DataFrame):
     print(table.to_string(index=False))
 
 
-def print_statistics(df_animals: pd.DataFrame, df_accidents: pd.DataFrame):
+def print_statistics(stats: dict):
     """
-    Print statistics computed for given dataframe.
+    Print statistics computed for given data.
 
-    :param df_animals: pandas dataframe containing dataframe with accidents
-    :param df_accidents: pandas dataframe containing dataframe with all accidents
+    :param stats: dictionary created by compute_statistics function
     """
     # Print number of accidens
-    print(f'Celkový počet nehod za uplynulé 2 roky: {len(df_accidents)}')
+    print(f'Celkový počet nehod za uplynulé 2 roky: {stats["accidents"]}')
 
     # Percentage of accidents where animals were involved
-    print(f'Procento nehod se zvířaty: {len(df_animals) / len(df_accidents) * 100:.2f}%')
+    print(f'Procento nehod se zvířaty: {stats["animals"] / stats["accidents"] * 100:.2f}%')
 
     # Percentage of accidents caused by wild animals
-    print(f'Procento nehod způsobených divokými zvířaty: {round(len(df_animals[df_animals["p8a"] < 13]) / len(df_animals) * 100)}%')
+    print(f'Procento nehod způsobených divokými zvířaty: {round(stats["wild"] / stats["animals"] * 100)}%')
 
     road_direction_map = {
         1: "přímý úsek",
@@ -223,42 +323,44 @@ def print_statistics(df_animals: pd.DataFrame, df_accidents: pd.DataFrame):
         7: "kruhový objezd",
     }
 
-    # Map the road direction to the dataframe new column
-    df_animals['roadDirection'] = df_animals['p28'].map(road_direction_map)
+    # Counts of road direction codes are summed for codes mapped to the same direction
+    directionCounts = pd.DataFrame([stats['road_direction']], index=['all']).T.groupby(road_direction_map).sum().T
+
+    # Compute most common roadDirection and its share
+    roadDirection = dominant_from_counts(directionCounts, pd.Series([stats['animals']], index=['all'])).iloc[0]
 
     # Print most common roadDirection
-    print(f'Nejčastější směr vozovky při nehodě se zvířetem: {df_animals["roadDirection"].value_counts().idxmax()}')
+    print(f'Nejčastější směr vozovky při nehodě se zvířetem: {roadDirection["mode"]}')
 
     # Print percentage of accidents in most common roadDirection
-    print(f'Procento nehod ve nejčastějším směru vozovky: {int(round(df_animals["roadDirection"].value_counts().max() / len(df_animals) * 100))}%')
+    print(f'Procento nehod ve nejčastějším směru vozovky: {int(round(roadDirection["share"] * 100))}%')
 
 
-def create_report(df_accidents: pd.DataFrame):
+def create_report(df_accidents: pd.DataFrame | Iterable[pd.DataFrame]):
     """
     Create graphs and prints computed data for the given dataframe for usage in report.
 
-    :param df_accidents: pandas dataframe containing data
+    :param df_accidents: pandas dataframe containing data or iterable of dataframes (chunks of the data)
     """
-    # Keep only accidents where animals were involved
-    df_animals = df_accidents.copy()
-    df_animals = df_animals[df_animals['p8a'] > 0]
+    # Compute all counts in a single pass over the data
+    stats = compute_statistics(df_accidents)
 
     # Print statistics for the given dataframe
-    print_statistics(df_animals, df_accidents)
+    print_statistics(stats)
 
     # Create a table with aggregated data (road types, animals, daytime) for the report
-    create_table(df_animals)
+    create_table(stats)
 
     # Create graph with number of accidents caused by animals in each hour
-    plot_animal_hours(df_animals)
+    plot_animal_hours(stats)
 
     # Create pie chart with animal types involved in accidents
-    plot_animal_type(df_animals)
+    plot_animal_type(stats)
 
 
 if __name__ == "__main__":
 
-    df_accidents = pd.read_pickle("accidents.pkl.gz")
-    df_consequences = pd.read_pickle("consequences.pkl.gz")
+    # Only columns used in the report are read
+    df_accidents = read_dataset("accidents", STATISTICS_COLUMNS)
 
     create_report(df_accidents)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3.12
+# coding=utf-8
+# Author: Samuel Hejnicek, xhejni00
+
+import numpy as np
+import pandas as pd
+from shared import decode_dates
+
+
+def add_date_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add date, year, month and weekday columns derived from the p2a column to the dataframe.
+    Columns are computed only once, if they are already present the dataframe is left untouched.
+
+    :param df: pandas dataframe containing the p2a column, it is modified in place
+    :return: the same dataframe with the new columns
+    """
+    # Skip decoding if the columns were already added
+    dateColumns = ["date", "year", "month", "weekday"]
+    if all(column in df.columns for column in dateColumns):
+        return df
+
+    # Parse each distinct date only once and add all derived columns
+    df[dateColumns] = decode_dates(df["p2a"])[dateColumns]
+
+    return df
+
+
+def time_parts(times: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split times stored as integers hhmm (p2b column) using integer arithmetic only.
+
+    :param times: array of times
+    :return: arrays with hours, minutes, validity of the time and flag of the day (6:00 to 21:59)
+    """
+    hours = times // 100
+    minutes = times % 100
+
+    # Unknown times are stored as values out of range (e.g. hour 25)
+    valid = (hours < 24) & (minutes < 60)
+
+    return hours, minutes, valid, (hours >= 6) & (hours < 22)
+
+
+def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add hour, minute, time_valid and is_day columns derived from the p2b column (time as integer hhmm).
+    Columns are computed only once, if they are already present the dataframe is left untouched.
+
+    :param df: pandas dataframe containing the p2b column, it is modified in place
+    :return: the same dataframe with the new columns
+    """
+    # Skip computation if the columns were already added
+    timeColumns = ["hour", "minute", "time_valid", "is_day"]
+    if all(column in df.columns for column in timeColumns):
+        return df
+
+    # Split the time using integer arithmetic only, missing times are invalid
+    times = df["p2b"].fillna(-1).to_numpy(dtype=np.int64)
+    df["hour"], df["minute"], df["time_valid"], df["is_day"] = time_parts(times)
+
+    return df
+
+
+def add_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add all date and time features (see add_date_features and add_time_features) to the dataframe.
+
+    :param df: pandas dataframe containing the p2a and p2b columns, it is modified in place
+    :return: the same dataframe with the new columns
+    """
+    add_date_features(df)
+    add_time_features(df)
+    return df
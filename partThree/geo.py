@@ -1,196 +1,453 @@
-#!/usr/bin/python3.10
-# coding=utf-8
-# Author> Samuel Hejnicek (xhejni00)
-
-import pandas as pd
-import geopandas
-import matplotlib.pyplot as plt
-import contextily
-import sklearn.cluster
-import numpy as np
-
-
-def make_geo(df_accidents: pd.DataFrame, df_locations: pd.DataFrame) -> geopandas.GeoDataFrame:
-    """
-    Create a GeoDataFrame from accident and location dataframes.
-
-    :param df_accidents: DataFrame with accident data
-    :param df_locations: DataFrame with location data
-    """
-    # Sort out only accidents in South Moravian Region
-    df_accidents = df_accidents[df_accidents['p4a'] == 6]
-
-    # Merge the two dataframes based on accident ID
-    newDf = pd.merge(df_accidents, df_locations, on='p1')
-
-    # Filter out rows with missing coordinates
-    newDf = newDf[newDf['d'].notna() & newDf['e'].notna()]
-
-    # Copy the dataframe to avoid SettingWithCopyWarning
-    filteredDf = newDf.copy()
-
-    # Swap columns if d is smaller than e (x < y)
-    filteredDf[['d', 'e']] = filteredDf[['d', 'e']].where(filteredDf['d'] >= filteredDf['e'], filteredDf[['e', 'd']].values)
-
-    # Create a GeoDataFrame from points in previous dataframe using Krovak projection
-    geoDf = geopandas.GeoDataFrame(filteredDf, geometry=geopandas.points_from_xy(filteredDf.d, filteredDf.e), crs='EPSG:5514')
-
-    return geoDf
-
-
-def plot_geo(gdf: geopandas.GeoDataFrame, fig_location: str = None,
-             show_figure: bool = False):
-    """
-    Plot two subgraphs of accidents under the influence of alcohol in South Moravian Region in January and July.
-
-    :param gdf: GeoDataFrame for plotting
-    :param fig_location: Path to save the figure
-    :param show_figure: If True, show the figure
-    """
-    # Copy original DataFrame to avoid SettingWithCopyWarning
-    dfAlcoholOnly = gdf.copy()
-
-    # Filter out only accidents where alcohol was involved
-    dfAlcoholOnly = dfAlcoholOnly[dfAlcoholOnly["p11"] >= 4]
-
-    # Create new column with a month of the accident
-    dfAlcoholOnly["month"] = pd.to_datetime(dfAlcoholOnly["p2a"], format="%d.%m.%Y").dt.month
-
-    # Reproject the data to GPS coordinates
-    dfAlcoholOnly = dfAlcoholOnly.to_crs(epsg=4326)
-
-    # Get the bounds of the data
-    minX, minY, maxX, maxY = dfAlcoholOnly.total_bounds
-    xRange = maxX - minX
-    yRange = maxY - minY
-
-    # Apply zoom
-    minX = minX + xRange * 0.1
-    maxX = maxX - xRange * 0.3
-    maxY = maxY - yRange * 0.17
-
-    # Create a figure with two subgraphs
-    fig, axes = plt.subplots(1, 2, figsize=(16, 16))
-
-    # Plot each month in specified subgraph
-    dfAlcoholOnly[dfAlcoholOnly["month"] == 1].plot(ax=axes[0], color='red', markersize=10, label="Leden")
-    dfAlcoholOnly[dfAlcoholOnly["month"] == 7].plot(ax=axes[1], color='red', markersize=10, label="Červenec")
-
-    # Set parameters for each subgraph
-    for i, ax in enumerate(axes):
-
-        # Set the title and labels
-        ax.set_title(f'JHM kraj pod vlivem alkoholu - ({"Leden" if i == 0 else "Červenec"})')
-        ax.set_xlabel("Zeměpisná délka")
-        ax.set_ylabel("Zeměpisná šířka")
-
-        # Set the bounds of the plot
-        ax.set_xlim(minX, maxX)
-        ax.set_ylim(minY, maxY)
-
-        # Set ticks on both axes to show degrees
-        xticks = ax.get_xticks()
-        yticks = ax.get_yticks()
-        ax.set_xticks(xticks)
-        ax.set_yticks(yticks)
-        ax.set_xticklabels([f'{xtick:.1f}°' for xtick in xticks])
-        ax.set_yticklabels([f'{ytick:.1f}°' for ytick in yticks])
-
-        # Add basemap
-        contextily.add_basemap(ax, crs=dfAlcoholOnly.crs.to_string(), alpha=0.9)
-
-    # Tight layout to prevent overlapping
-    fig.tight_layout()
-
-    # If path is specified, save the figure
-    if fig_location:
-        plt.savefig(fig_location, bbox_inches='tight')
-
-    # If True, show the figure
-    if show_figure:
-        plt.show()
-
-
-def plot_cluster(gdf: geopandas.GeoDataFrame, fig_location: str = None,
-                 show_figure: bool = False):
-    """
-    Plot accidents caused by wild animals in clusters.
-
-    :param gdf: GeoDataFrame for plotting created by make_geo function
-    :param fig_location: Path to save the figure
-    :param show_figure: If True, show the figure
-    """
-    # Copy original DataFrame to avoid SettingWithCopyWarning
-    newDf = gdf.copy()
-
-    # Filter out only accidents caused by wild animals
-    newDf = newDf[newDf["p10"] == 4]
-
-    # Reproject the data to Web Mercator
-    newDf = newDf.to_crs(epsg=3857)
-
-    # Create a coordinate matrix
-    coordinates = np.dstack([newDf.geometry.x, newDf.geometry.y]).reshape(-1, 2)
-
-    """
-    The method chosen for clustering is KMeans in MiniBatchKMeans variant (faster than classic KMeans). It was presented on lectures
-    and when tried on the dataset, I found a solution correspondning with reference solution. The number of clusters was set to 8.
-    """
-
-    # Apply KMeans clustering for the coordinates
-    db = sklearn.cluster.MiniBatchKMeans(n_clusters=8).fit(coordinates)
-
-    # Create new column with labels for each cluster
-    newDf['cluster'] = db.labels_
-
-    # Use dissolve to merge the clusters, count number of accidents in each cluster and save it to new column
-    accidentClusters = newDf.dissolve(by='cluster', aggfunc={"p1": "count"}).rename(columns={"p1": "cnt"})
-
-    # Add geometry column with convex hull for each cluster
-    accidentClusters['geometry'] = accidentClusters.geometry.convex_hull
-
-    # Create a figure
-    plt.figure(figsize=(15, 12))
-    ax = plt.gca()
-
-    # Set the title
-    ax.set_title("Nehody v JHM kraji zaviněné lesní zvěří")
-
-    # Plot each accident as a point
-    newDf.plot(ax=ax, color='tab:red', alpha=0.35)
-
-    # Plot each cluster as a polygon with color corresponding to the number of accidents in the cluster
-    accidentClusters.plot(ax=ax, column='cnt', legend=True, cmap='viridis', alpha=0.5, legend_kwds={'label': "Počet nehod v úseku", 'orientation': "horizontal", 'shrink': 0.91, 'pad': 0.01})
-
-    # Add the background map
-    contextily.add_basemap(ax, crs=newDf.crs.to_string(), alpha=0.9, zoom=9)
-
-    # Remove x and y axis with labels
-    ax.axis('off')
-
-    # Limit the x and y axes to remove accidents outside the region (2 of them)
-    ax.set_xlim(right=(1.98e6))
-    ax.set_ylim(top=(6.39e6))
-
-    # If path is specified, save the figure
-    if fig_location:
-        plt.savefig(fig_location, bbox_inches='tight')
-
-    # If True, show the figure
-    if show_figure:
-        plt.show()
-
-
-if __name__ == "__main__":
-    # zde muzete delat libovolne modifikace
-    df_accidents = pd.read_pickle("accidents.pkl.gz")
-    df_locations = pd.read_pickle("locations.pkl.gz")
-    gdf = make_geo(df_accidents, df_locations)
-
-    plot_geo(gdf, "geo1.png", False)
-    plot_cluster(gdf, "geo2.png", False)
-
-    # testovani splneni zadani
-    import os
-    assert os.path.exists("geo1.png")
-    assert os.path.exists("geo2.png")
+#!/usr/bin/python3.10
+# coding=utf-8
+# Author> Samuel Hejnicek (xhejni00)
+
+import pandas as pd
+import geopandas
+import matplotlib.pyplot as plt
+import matplotlib.colors
+import sklearn.cluster
+import sklearn.metrics
+import numpy as np
+import pyproj
+import shapely
+import os
+import hashlib
+import features
+import tiles
+from dataset import dataset_path, partition_files, read_dataset, read_partitioned
+from shared import Query, file_hash, store_cache
+from concurrent.futures import ProcessPoolExecutor
+
+# Columns with precomputed coordinates stored in the cache for each projection
+PROJECTED_COLUMNS = {
+    4326: ('lon', 'lat'),
+    3857: ('mx', 'my'),
+}
+
+
+def geo_cache_file(cache_dir: str, *paths: str) -> str:
+    """
+    Create path to the cache of make_geo output keyed by content of the input data files,
+    make_geo adds the region and the columns of the input dataframes to the name.
+
+    :param cache_dir: Directory with cached files
+    :param paths: Paths to the input data files (see dataset_path) or partition files (see partition_files)
+    :return: Path to the cache file
+    """
+    # Hashes of all files are combined, so the name has the same length for any number of files
+    key = hashlib.sha256(''.join(file_hash(path) for path in paths).encode('utf-8')).hexdigest()[:32]
+    return os.path.join(cache_dir, f'geo_{key}.parquet')
+
+
+def to_crs(gdf: geopandas.GeoDataFrame, epsg: int) -> geopandas.GeoDataFrame:
+    """
+    Reproject GeoDataFrame, precomputed coordinates from the make_geo cache are used when available.
+
+    :param gdf: GeoDataFrame created by make_geo function
+    :param epsg: EPSG code of the target projection
+    :return: Reprojected GeoDataFrame
+    """
+    if epsg in PROJECTED_COLUMNS and all(column in gdf.columns for column in PROJECTED_COLUMNS[epsg]):
+        x, y = PROJECTED_COLUMNS[epsg]
+        return gdf.set_geometry(geopandas.points_from_xy(gdf[x], gdf[y]), crs=f'EPSG:{epsg}')
+
+    return gdf.to_crs(epsg=epsg)
+
+
+def make_geo(df_accidents: pd.DataFrame, df_locations: pd.DataFrame,
+             cache_file: str = None, region: int | None = 6) -> geopandas.GeoDataFrame:
+    """
+    Create a GeoDataFrame from accident and location dataframes.
+
+    :param df_accidents: DataFrame with accident data
+    :param df_locations: DataFrame with location data
+    :param cache_file: Path to the cache with cleaned and projected coordinates (see geo_cache_file),
+                       it is read if it exists and written otherwise
+    :param region: Code of the region (p4a) to keep, South Moravian Region by default, if None all regions are kept
+    """
+    # Output depends on the region and on the input columns as well, each variant has its own cache file
+    if cache_file:
+        columns = ','.join(map(str, df_accidents.columns)) + '|' + ','.join(map(str, df_locations.columns))
+        variant = f"{'all' if region is None else region}_{hashlib.sha1(columns.encode('utf-8')).hexdigest()[:8]}"
+        root, extension = os.path.splitext(cache_file)
+        cache_file = f'{root}_{variant}{extension}'
+
+    # Reuse cleaned coordinates from the cache, geometry is created from plain float columns
+    if cache_file and os.path.exists(cache_file):
+        cachedDf = pd.read_parquet(cache_file, memory_map=True)
+        return geopandas.GeoDataFrame(cachedDf, geometry=geopandas.points_from_xy(cachedDf.d, cachedDf.e), crs='EPSG:5514')
+
+    # Sort out only accidents in the selected region
+    query = Query(df_accidents)
+    if region is not None:
+        query = query.filter('p4a', '==', region)
+
+    # Merge accidents with locations based on accident ID, rows with missing coordinates are filtered out before the merge
+    query = query.join(Query(df_locations), on='p1').filter('d', 'notna').filter('e', 'notna')
+    filteredDf = query.collect()
+
+    # Swap columns if d is smaller than e (x < y)
+    x = np.maximum(filteredDf['d'].to_numpy(), filteredDf['e'].to_numpy())
+    y = np.minimum(filteredDf['d'].to_numpy(), filteredDf['e'].to_numpy())
+    filteredDf['d'] = x
+    filteredDf['e'] = y
+
+    if cache_file:
+        # Precompute coordinates in projections used by the plots
+        for epsg, (xColumn, yColumn) in PROJECTED_COLUMNS.items():
+            transformer = pyproj.Transformer.from_crs('EPSG:5514', f'EPSG:{epsg}', always_xy=True)
+            filteredDf[xColumn], filteredDf[yColumn] = transformer.transform(x, y)
+
+        # Store coordinates as plain columns
+        store_cache(filteredDf, cache_file)
+
+    # Create a GeoDataFrame from points in previous dataframe using Krovak projection
+    geoDf = geopandas.GeoDataFrame(filteredDf, geometry=geopandas.points_from_xy(x, y), crs='EPSG:5514')
+
+    return geoDf
+
+
+def make_geo_regions(df_accidents: pd.DataFrame, df_locations: pd.DataFrame, workers: int = None,
+                     combine: bool = False) -> dict[int, geopandas.GeoDataFrame] | geopandas.GeoDataFrame:
+    """
+    Create GeoDataFrames for all regions. Both dataframes are partitioned by region once
+    and each region is processed in a separate worker process.
+
+    :param df_accidents: DataFrame with accident data
+    :param df_locations: DataFrame with location data
+    :param workers: Number of worker processes, if None number of CPUs is used
+    :param combine: If True, return one GeoDataFrame with region (p4a) as the first level of index
+    :return: Dictionary mapping region code (p4a) to its GeoDataFrame or one combined GeoDataFrame
+    """
+    # Assign each location to the region of its accident using accident ID
+    accidentRegions = df_accidents.drop_duplicates('p1').set_index('p1')['p4a']
+    locationRegions = df_locations['p1'].map(accidentRegions)
+
+    # Split both dataframes to partitions by region
+    accidentParts = dict(list(df_accidents.groupby('p4a')))
+    locationParts = dict(list(df_locations.groupby(locationRegions)))
+    regions = list(accidentParts)
+
+    # Create GeoDataFrame for each region in parallel, each worker merges only its partition
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        gdfs = executor.map(make_geo,
+                            [accidentParts[region] for region in regions],
+                            [locationParts.get(region, df_locations.iloc[:0]) for region in regions],
+                            [None] * len(regions),
+                            [None] * len(regions))
+        gdfsByRegion = dict(zip(regions, gdfs))
+
+    if combine:
+        return geopandas.GeoDataFrame(pd.concat(gdfsByRegion, names=['region']), crs='EPSG:5514')
+
+    return gdfsByRegion
+
+
+def plot_density(ax, x: np.ndarray, y: np.ndarray, mode: str = 'hex', gridsize: int = 100,
+                 extent: tuple = None, cmap: str = 'Reds', alpha: float = 0.8):
+    """
+    Plot density of points aggregated to a regular grid, drawing time depends only on the grid size.
+
+    :param ax: Matplotlib axes
+    :param x: X coordinates of the points
+    :param y: Y coordinates of the points
+    :param mode: 'hex' for hexagonal grid or 'grid' for square grid
+    :param gridsize: Number of cells in x direction
+    :param extent: Bounds of the grid (minX, maxX, minY, maxY), bounds of the points if None
+    :param cmap: Name of the color map
+    :param alpha: Transparency of the cells
+    :return: Mappable object for a colorbar
+    """
+    if extent is None:
+        extent = (np.min(x), np.max(x), np.min(y), np.max(y))
+
+    if mode == 'hex':
+        # Matplotlib bins the points itself and draws all cells as one collection
+        return ax.hexbin(x, y, gridsize=gridsize, extent=extent, mincnt=1, bins='log', cmap=cmap, alpha=alpha)
+
+    if mode == 'grid':
+        # Count points in square cells, cells without points are not drawn
+        counts, _, _ = np.histogram2d(x, y, bins=gridsize, range=[extent[:2], extent[2:]])
+        return ax.imshow(np.ma.masked_equal(counts.T, 0), origin='lower', extent=extent, cmap=cmap, alpha=alpha,
+                         norm=matplotlib.colors.LogNorm(), interpolation='nearest', aspect='auto')
+
+    raise ValueError(f'Unsupported density mode: {mode}')
+
+
+def plot_geo(gdf: geopandas.GeoDataFrame, fig_location: str = None,
+             show_figure: bool = False, render: str = 'points', gridsize: int = 100):
+    """
+    Plot two subgraphs of accidents under the influence of alcohol in South Moravian Region in January and July.
+
+    :param gdf: GeoDataFrame for plotting
+    :param fig_location: Path to save the figure
+    :param show_figure: If True, show the figure
+    :param render: 'points' to plot each accident, 'hex' or 'grid' to plot density of accidents (see plot_density)
+    :param gridsize: Number of cells in x direction used for density
+    """
+    # Copy original DataFrame to avoid SettingWithCopyWarning
+    dfAlcoholOnly = gdf.copy()
+
+    # Filter out only accidents where alcohol was involved
+    dfAlcoholOnly = dfAlcoholOnly[dfAlcoholOnly["p11"] >= 4]
+
+    # Create new columns with parts of the date, month is used to split the subgraphs
+    features.add_date_features(dfAlcoholOnly)
+
+    # Reproject the data to GPS coordinates
+    dfAlcoholOnly = to_crs(dfAlcoholOnly, 4326)
+
+    # Get the bounds of the data
+    minX, minY, maxX, maxY = dfAlcoholOnly.total_bounds
+    xRange = maxX - minX
+    yRange = maxY - minY
+
+    # Apply zoom
+    minX = minX + xRange * 0.1
+    maxX = maxX - xRange * 0.3
+    maxY = maxY - yRange * 0.17
+
+    # Create a figure with two subgraphs
+    fig, axes = plt.subplots(1, 2, figsize=(16, 16))
+
+    # Plot each month in specified subgraph
+    if render == 'points':
+        dfAlcoholOnly[dfAlcoholOnly["month"] == 1].plot(ax=axes[0], color='red', markersize=10, label="Leden")
+        dfAlcoholOnly[dfAlcoholOnly["month"] == 7].plot(ax=axes[1], color='red', markersize=10, label="Červenec")
+    else:
+        # Both months use the same grid so their cells can be compared
+        for ax, month in zip(axes, (1, 7)):
+            monthDf = dfAlcoholOnly[dfAlcoholOnly["month"] == month]
+            density = plot_density(ax, monthDf.geometry.x.to_numpy(), monthDf.geometry.y.to_numpy(), render,
+                                   gridsize, (minX, maxX, minY, maxY))
+            fig.colorbar(density, ax=ax, label="Počet nehod v buňce", orientation="horizontal", shrink=0.8, pad=0.05)
+
+    # Set parameters for each subgraph
+    for i, ax in enumerate(axes):
+
+        # Set the title and labels
+        ax.set_title(f'JHM kraj pod vlivem alkoholu - ({"Leden" if i == 0 else "Červenec"})')
+        ax.set_xlabel("Zeměpisná délka")
+        ax.set_ylabel("Zeměpisná šířka")
+
+        # Set the bounds of the plot
+        ax.set_xlim(minX, maxX)
+        ax.set_ylim(minY, maxY)
+
+        # Set ticks on both axes to show degrees
+        xticks = ax.get_xticks()
+        yticks = ax.get_yticks()
+        ax.set_xticks(xticks)
+        ax.set_yticks(yticks)
+        ax.set_xticklabels([f'{xtick:.1f}°' for xtick in xticks])
+        ax.set_yticklabels([f'{ytick:.1f}°' for ytick in yticks])
+
+        # Add basemap from the tile cache, both subgraphs share the decoded tiles
+        tiles.add_basemap(ax, crs=dfAlcoholOnly.crs.to_string(), alpha=0.9)
+
+    # Tight layout to prevent overlapping
+    fig.tight_layout()
+
+    # If path is specified, save the figure
+    if fig_location:
+        plt.savefig(fig_location, bbox_inches='tight')
+
+    # If True, show the figure
+    if show_figure:
+        plt.show()
+
+
+def cluster_points(coordinates: np.ndarray, n_clusters: int = 8, seed: int = None,
+                   chunk_size: int = 10000, epochs: int = 3) -> tuple[np.ndarray, sklearn.cluster.MiniBatchKMeans]:
+    """
+    Cluster points using MiniBatchKMeans fitted on fixed-size chunks of the points.
+    Clusters are numbered by their centers (from west to east), so the same seed gives the same labels.
+
+    :param coordinates: Array of shape (n, 2) with coordinates of the points
+    :param n_clusters: Number of clusters
+    :param seed: Seed of the random generator, if None results are not reproducible
+    :param chunk_size: Number of points in one chunk passed to partial_fit
+    :param epochs: Number of passes over all points
+    :return: Labels of the points and the fitted model
+    """
+    model = sklearn.cluster.MiniBatchKMeans(n_clusters=n_clusters, random_state=seed)
+
+    # The first chunk must contain at least n_clusters points to initialize the centers
+    chunk_size = max(chunk_size, n_clusters)
+
+    # Shuffle the points so the chunks are not ordered by location
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        shuffled = coordinates[rng.permutation(len(coordinates))]
+        for start in range(0, len(shuffled), chunk_size):
+            chunk = shuffled[start:start + chunk_size]
+            # Last chunk may be too small to initialize the centers in the first call
+            if len(chunk) >= n_clusters or hasattr(model, 'cluster_centers_'):
+                model.partial_fit(chunk)
+
+    # Order clusters by x and y coordinates of their centers
+    order = np.lexsort((model.cluster_centers_[:, 1], model.cluster_centers_[:, 0]))
+    model.cluster_centers_ = model.cluster_centers_[order]
+
+    # Predict labels in chunks as well
+    labels = np.concatenate([model.predict(coordinates[start:start + chunk_size])
+                             for start in range(0, len(coordinates), chunk_size)])
+
+    return labels, model
+
+
+def _score_clusters(coordinates: np.ndarray, n_clusters: int, seed: int, chunk_size: int,
+                    sample_size: int) -> dict:
+    """
+    Cluster points and compute inertia and silhouette score of the result (used by sweep_clusters).
+    """
+    labels, model = cluster_points(coordinates, n_clusters, seed, chunk_size)
+
+    # Inertia is computed in chunks, score returns negative inertia
+    inertia = -sum(model.score(coordinates[start:start + chunk_size])
+                   for start in range(0, len(coordinates), chunk_size))
+
+    # Silhouette score is computed only on a sample of points because it is quadratic in the number of points
+    silhouette = sklearn.metrics.silhouette_score(coordinates, labels, sample_size=min(sample_size, len(coordinates)),
+                                                  random_state=seed)
+
+    return {'k': n_clusters, 'inertia': inertia, 'silhouette': silhouette}
+
+
+def sweep_clusters(coordinates: np.ndarray, k_values: list[int], seed: int = None, workers: int = None,
+                   chunk_size: int = 10000, sample_size: int = 10000) -> pd.DataFrame:
+    """
+    Cluster points for each number of clusters in parallel worker processes and score the results.
+
+    :param coordinates: Array of shape (n, 2) with coordinates of the points
+    :param k_values: Numbers of clusters to try
+    :param seed: Seed of the random generator, if None results are not reproducible
+    :param workers: Number of worker processes, if None number of CPUs is used
+    :param chunk_size: Number of points in one chunk passed to partial_fit
+    :param sample_size: Number of points used for the silhouette score
+    :return: DataFrame with k, inertia and silhouette columns
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        scores = executor.map(_score_clusters, [coordinates] * len(k_values), k_values, [seed] * len(k_values),
+                              [chunk_size] * len(k_values), [sample_size] * len(k_values))
+        return pd.DataFrame(list(scores))
+
+
+def cluster_summary(coordinates: np.ndarray, labels: np.ndarray, crs: str) -> geopandas.GeoDataFrame:
+    """
+    Count points and compute convex hull of each cluster directly from the coordinates.
+
+    :param coordinates: Array of shape (n, 2) with coordinates of the points
+    :param labels: Cluster label of each point
+    :param crs: Coordinate reference system of the coordinates
+    :return: GeoDataFrame indexed by cluster with number of points (cnt) and convex hull of the cluster
+    """
+    # Sort points by label so points of each cluster are stored together
+    order = np.argsort(labels, kind='stable')
+    clusters, counts = np.unique(labels[order], return_counts=True)
+
+    # Create one multipoint per cluster and compute all hulls in a single vectorized call
+    indices = np.repeat(np.arange(len(clusters)), counts)
+    hulls = shapely.convex_hull(shapely.multipoints(coordinates[order], indices=indices))
+
+    return geopandas.GeoDataFrame({'cnt': counts}, geometry=hulls, index=pd.Index(clusters, name='cluster'), crs=crs)
+
+
+def plot_cluster(gdf: geopandas.GeoDataFrame, fig_location: str = None,
+                 show_figure: bool = False, n_clusters: int = 8, seed: int | None = 0,
+                 render: str = 'points', gridsize: int = 200):
+    """
+    Plot accidents caused by wild animals in clusters.
+
+    :param gdf: GeoDataFrame for plotting created by make_geo function
+    :param fig_location: Path to save the figure
+    :param show_figure: If True, show the figure
+    :param n_clusters: Number of clusters
+    :param seed: Seed of the clustering, the same seed gives the same clusters,
+                 fixed by default so the figure does not change between runs, if None results are not reproducible
+    :param render: 'points' to plot each accident, 'hex' or 'grid' to plot density of accidents (see plot_density)
+    :param gridsize: Number of cells in x direction used for density
+    """
+    # Copy original DataFrame to avoid SettingWithCopyWarning
+    newDf = gdf.copy()
+
+    # Filter out only accidents caused by wild animals
+    newDf = newDf[newDf["p10"] == 4]
+
+    # Reproject the data to Web Mercator
+    newDf = to_crs(newDf, 3857)
+
+    # Create a coordinate matrix
+    coordinates = np.dstack([newDf.geometry.x, newDf.geometry.y]).reshape(-1, 2)
+
+    """
+    The method chosen for clustering is KMeans in MiniBatchKMeans variant (faster than classic KMeans). It was presented on lectures
+    and when tried on the dataset, I found a solution correspondning with reference solution. The number of clusters was set to 8.
+    """
+
+    # Apply KMeans clustering for the coordinates
+    labels, _ = cluster_points(coordinates, n_clusters, seed)
+
+    # Create new column with labels for each cluster
+    newDf['cluster'] = labels
+
+    # Count number of accidents in each cluster and create convex hull for each cluster
+    accidentClusters = cluster_summary(coordinates, labels, newDf.crs)
+
+    # Create a figure
+    plt.figure(figsize=(15, 12))
+    ax = plt.gca()
+
+    # Set the title
+    ax.set_title("Nehody v JHM kraji zaviněné lesní zvěří")
+
+    # Plot each accident as a point or density of accidents
+    if render == 'points':
+        newDf.plot(ax=ax, color='tab:red', alpha=0.35)
+    else:
+        plot_density(ax, coordinates[:, 0], coordinates[:, 1], render, gridsize, alpha=0.6)
+
+    # Plot each cluster as a polygon with color corresponding to the number of accidents in the cluster
+    accidentClusters.plot(ax=ax, column='cnt', legend=True, cmap='viridis', alpha=0.5, legend_kwds={'label': "Počet nehod v úseku", 'orientation': "horizontal", 'shrink': 0.91, 'pad': 0.01})
+
+    # Add the background map from the tile cache
+    tiles.add_basemap(ax, crs=newDf.crs.to_string(), alpha=0.9, zoom=9)
+
+    # Remove x and y axis with labels
+    ax.axis('off')
+
+    # Limit the x and y axes to remove accidents outside the region (2 of them)
+    ax.set_xlim(right=(1.98e6))
+    ax.set_ylim(top=(6.39e6))
+
+    # If path is specified, save the figure
+    if fig_location:
+        plt.savefig(fig_location, bbox_inches='tight')
+
+    # If True, show the figure
+    if show_figure:
+        plt.show()
+
+
+if __name__ == "__main__":
+    # zde muzete delat libovolne modifikace
+    # Partitioned store (see dataset.py) is preferred, only partitions of the plotted region are read then
+    if os.path.isdir("accidents_parts"):
+        df_accidents = read_partitioned("accidents_parts", region=6, columns=["p1", "p2a", "p4a", "p10", "p11"])
+        accidentFiles = partition_files("accidents_parts", region=6)
+    else:
+        df_accidents = read_dataset("accidents", ["p1", "p2a", "p4a", "p10", "p11"])
+        accidentFiles = [dataset_path("accidents")]
+    df_locations = read_dataset("locations", ["p1", "d", "e"])
+
+    # Cache is keyed by the files the accidents were actually read from
+    gdf = make_geo(df_accidents, df_locations, geo_cache_file("cache", *accidentFiles, dataset_path("locations")))
+
+    plot_geo(gdf, "geo1.png", False)
+    plot_cluster(gdf, "geo2.png", False)
+
+    # testovani splneni zadani
+    import os
+    assert os.path.exists("geo1.png")
+    assert os.path.exists("geo2.png")
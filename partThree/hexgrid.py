@@ -0,0 +1,134 @@
+#!/usr/bin/python3.10
+# coding=utf-8
+# Author> Samuel Hejnicek (xhejni00)
+
+import numpy as np
+import pandas as pd
+import geopandas
+from shared import decode_dates
+
+# Axial coordinates of the cells are shifted by HEX_OFFSET to be positive and packed to one integer
+HEX_OFFSET = 1 << 24
+HEX_SHIFT = 25
+
+
+def hex_cells(x: np.ndarray, y: np.ndarray, size: float) -> np.ndarray:
+    """
+    Assign points to cells of a hexagonal grid (pointy-top hexagons) using only array arithmetic.
+
+    :param x: X coordinates of the points in meters
+    :param y: Y coordinates of the points in meters
+    :param size: Distance from the center of a cell to its corner in meters
+    :return: Integer ID of the cell for each point
+    """
+    # Fractional axial coordinates of the points
+    q = (np.sqrt(3) / 3 * x - y / 3) / size
+    r = (2 / 3 * y) / size
+    s = -q - r
+
+    # Round cube coordinates, the coordinate with the largest rounding error is recomputed from the others
+    qRound, rRound, sRound = np.round(q), np.round(r), np.round(s)
+    qDiff, rDiff, sDiff = np.abs(qRound - q), np.abs(rRound - r), np.abs(sRound - s)
+    fixQ = (qDiff > rDiff) & (qDiff > sDiff)
+    fixR = ~fixQ & (rDiff > sDiff)
+    qRound = np.where(fixQ, -rRound - sRound, qRound)
+    rRound = np.where(fixR, -qRound - sRound, rRound)
+
+    return ((qRound.astype(np.int64) + HEX_OFFSET) << HEX_SHIFT) | (rRound.astype(np.int64) + HEX_OFFSET)
+
+
+def hex_centers(cells: np.ndarray, size: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute centers of the hexagonal cells.
+
+    :param cells: Cell IDs returned by hex_cells
+    :param size: Size of the cells used in hex_cells
+    :return: X and Y coordinates of the centers
+    """
+    q = (cells >> HEX_SHIFT) - HEX_OFFSET
+    r = (cells & ((1 << HEX_SHIFT) - 1)) - HEX_OFFSET
+    return size * np.sqrt(3) * (q + r / 2), size * 1.5 * r
+
+
+def _count_by(inverse: np.ndarray, values: np.ndarray, groups: int, prefix: str) -> pd.DataFrame:
+    """
+    Count occurrences of each value in each group with a single bincount.
+
+    :param inverse: Group index of each point
+    :param values: Category of each point, missing values are not counted
+    :param groups: Number of groups
+    :param prefix: Prefix of the column names
+    :return: DataFrame with one row per group and one column per category
+    """
+    codes, categories = pd.factorize(values, sort=True)
+    valid = codes >= 0
+    counts = np.bincount(inverse[valid] * len(categories) + codes[valid], minlength=groups * len(categories))
+    return pd.DataFrame(counts.reshape(groups, len(categories)),
+                        columns=[f'{prefix}_{int(category)}' for category in categories])
+
+
+def hotspot_table(gdf: geopandas.GeoDataFrame, sizes: tuple[float] = (500, 1000, 2000)) -> pd.DataFrame:
+    """
+    Aggregate accidents to hexagonal cells of several sizes in each region.
+
+    :param gdf: GeoDataFrame created by make_geo function (coordinates in meters)
+    :param sizes: Sizes of the cells in meters
+    :return: DataFrame with size, region, cell, center coordinates, total count,
+             counts by accident type (p10_*), count of accidents under the influence of alcohol
+             and counts by month (month_*)
+    """
+    # Compute month of each accident only once for all sizes, the given dataframe is not modified
+    months = decode_dates(gdf['p2a'])['month'].to_numpy()
+
+    x = gdf.geometry.x.to_numpy()
+    y = gdf.geometry.y.to_numpy()
+    regions = gdf['p4a'].to_numpy().astype(np.int64)
+    alcohol = (gdf['p11'] >= 4).to_numpy()
+
+    tables = []
+    for size in sizes:
+        # Region code (less than 32) is stored in the lowest bits of the key together with the cell
+        keys, inverse = np.unique((hex_cells(x, y, size) << 5) | regions, return_inverse=True)
+        inverse = inverse.ravel()
+        cells = keys >> 5
+        centerX, centerY = hex_centers(cells, size)
+
+        table = pd.DataFrame({
+            'size': size,
+            'region': keys & 31,
+            'cell': cells,
+            'x': centerX,
+            'y': centerY,
+            'count': np.bincount(inverse, minlength=len(keys)),
+            'alcohol': np.bincount(inverse, weights=alcohol, minlength=len(keys)).astype(np.int64),
+        })
+        tables.append(pd.concat([
+            table,
+            _count_by(inverse, gdf['p10'].to_numpy(), len(keys), 'p10'),
+            _count_by(inverse, months, len(keys), 'month'),
+        ], axis=1))
+
+    # Categories missing for some sizes are filled with zeros, counts are integers again then
+    table = pd.concat(tables, ignore_index=True)
+    countColumns = [column for column in table.columns if column.startswith(('p10_', 'month_'))]
+    table[countColumns] = table[countColumns].fillna(0).astype(np.int64)
+    return table
+
+
+def top_hotspots(table: pd.DataFrame, n: int = 10, by: str = 'count', size: float = None) -> pd.DataFrame:
+    """
+    Select cells with the highest number of accidents in each region.
+
+    :param table: DataFrame created by hotspot_table function
+    :param n: Number of cells per region
+    :param by: Column used for ranking (e.g. count, alcohol, p10_4)
+    :param size: Size of the cells, all sizes are used if None
+    :return: DataFrame with the top cells of each region ranked by the column
+    """
+    if size is not None:
+        table = table[table['size'] == size]
+
+    ranked = table.sort_values(['size', 'region', by], ascending=[True, True, False])
+    ranked = ranked.groupby(['size', 'region']).head(n).copy()
+    ranked['rank'] = ranked.groupby(['size', 'region']).cumcount() + 1
+    return ranked.reset_index(drop=True)
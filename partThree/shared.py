@@ -0,0 +1,12 @@
+#!/usr/bin/env python3.12
+# coding=utf-8
+# Author: Samuel Hejnicek, xhejni00
+
+import os
+import sys
+
+# Make modules from the second part of the project importable, other modules of this part import them from here
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "partTwo"))
+
+from helpers import atomic_write, decode_dates, file_hash, store_cache  # noqa: E402, F401
+from query import Query  # noqa: E402, F401
@@ -0,0 +1,82 @@
+#!/usr/bin/python3.10
+# coding=utf-8
+# Author> Samuel Hejnicek (xhejni00)
+
+import numpy as np
+import pandas as pd
+import geopandas
+import shapely
+
+
+def load_features(path: str, layer: str = None) -> geopandas.GeoDataFrame:
+    """
+    Load road segments or polygons (e.g. municipalities) from a local file (GeoPackage, Shapefile, GeoJSON).
+
+    :param path: Path to the file
+    :param layer: Name of the layer for files with more layers
+    :return: GeoDataFrame with the features
+    """
+    return geopandas.read_file(path, layer=layer)
+
+
+def join_points(points: geopandas.GeoDataFrame, features: geopandas.GeoDataFrame, max_distance: float = None,
+                predicate: str = 'auto', batch_size: int = 100000) -> pd.DataFrame:
+    """
+    Assign points to features using STRtree index, points are queried in batches.
+
+    :param points: GeoDataFrame with points (e.g. created by make_geo function)
+    :param features: GeoDataFrame with road segments or polygons
+    :param max_distance: Maximal distance to the nearest feature in units of the features CRS,
+                         points farther from all features are not assigned
+    :param predicate: 'within' to assign points to polygons containing them, 'nearest' to assign points
+                      to the nearest feature, 'auto' uses 'within' for polygons and 'nearest' otherwise
+    :param batch_size: Number of points in one query
+    :return: DataFrame with position of the point, position of the feature and their distance
+    """
+    # Both layers must use the same coordinate system
+    if points.crs != features.crs:
+        points = points.to_crs(features.crs)
+
+    if predicate == 'auto':
+        isPolygon = features.geom_type.isin(['Polygon', 'MultiPolygon']).all()
+        predicate = 'within' if isPolygon else 'nearest'
+
+    tree = shapely.STRtree(features.geometry.values)
+    geometries = points.geometry.values
+
+    pairs = []
+    for start in range(0, len(geometries), batch_size):
+        batch = geometries[start:start + batch_size]
+
+        if predicate == 'within':
+            # Points inside polygons have zero distance
+            indices = tree.query(batch, predicate='within')
+            distances = np.zeros(indices.shape[1])
+        elif predicate == 'nearest':
+            # Only one feature is assigned to each point even if more of them are equally near
+            indices, distances = tree.query_nearest(batch, max_distance=max_distance, return_distance=True,
+                                                    all_matches=False)
+        else:
+            raise ValueError(f'Unsupported predicate: {predicate}')
+
+        pairs.append(pd.DataFrame({'point': indices[0] + start, 'feature': indices[1], 'distance': distances}))
+
+    if not pairs:
+        return pd.DataFrame({'point': [], 'feature': [], 'distance': []})
+
+    return pd.concat(pairs, ignore_index=True)
+
+
+def count_by_feature(points: geopandas.GeoDataFrame, features: geopandas.GeoDataFrame,
+                     max_distance: float = None, predicate: str = 'auto',
+                     batch_size: int = 100000) -> geopandas.GeoDataFrame:
+    """
+    Count points assigned to each feature (see join_points for description of the arguments).
+
+    :return: Copy of the features with count column
+    """
+    pairs = join_points(points, features, max_distance, predicate, batch_size)
+
+    counted = features.copy()
+    counted['count'] = np.bincount(pairs['feature'].to_numpy(dtype=np.int64), minlength=len(features))
+    return counted
@@ -0,0 +1,199 @@
+#!/usr/bin/python3.10
+# coding=utf-8
+# Author> Samuel Hejnicek (xhejni00)
+
+import os
+import io
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+import mercantile
+import pyproj
+import contextily
+from PIL import Image
+from shared import atomic_write
+
+# Settings of the tile cache, use configure function to change them
+SETTINGS = {
+    'tile_dir': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'tiles'),
+    'url': contextily.providers.OpenStreetMap.HOT.build_url(),
+    'attribution': contextily.providers.OpenStreetMap.HOT.attribution,
+    'offline': False,
+    'local_url': None,
+}
+
+# Maximal zoom level used when zoom is calculated automatically
+MAX_ZOOM = 19
+
+# Shared HTTP session, connections to the tile server are reused
+_session = requests.Session()
+
+
+def configure(tile_dir: str = None, url: str = None, attribution: str = None,
+              offline: bool = None, local_url: str = None):
+    """
+    Change settings of the tile cache, arguments which are None are left unchanged.
+
+    :param tile_dir: Directory where downloaded tiles are stored
+    :param url: Template of the tile server URL with {x}, {y} and {z} placeholders
+    :param attribution: Attribution text of the tile provider shown in the maps
+    :param offline: If True, tiles are only read from tile_dir (or from local_url) and nothing is written
+    :param local_url: Template of the URL of a local tile server used for missing tiles in offline mode
+    """
+    for key, value in (('tile_dir', tile_dir), ('url', url), ('attribution', attribution),
+                       ('offline', offline), ('local_url', local_url)):
+        if value is not None:
+            SETTINGS[key] = value
+
+    # Decoded tiles may come from a different source now
+    _decode_tile.cache_clear()
+
+
+def _tile_path(x: int, y: int, z: int) -> str:
+    """
+    Return path to the file with the tile in the tile directory.
+    """
+    return os.path.join(SETTINGS['tile_dir'], str(z), str(x), f'{y}.png')
+
+
+def fetch_tile(x: int, y: int, z: int) -> bytes:
+    """
+    Return encoded tile from the tile directory, missing tiles are downloaded and stored.
+
+    :param x: Column of the tile
+    :param y: Row of the tile
+    :param z: Zoom level of the tile
+    :return: Content of the tile image file
+    """
+    path = _tile_path(x, y, z)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    if SETTINGS['offline']:
+        # In offline mode only a local tile server can be used and the tile directory is read only
+        if SETTINGS['local_url'] is None:
+            raise FileNotFoundError(f'Tile {z}/{x}/{y} is not in {SETTINGS["tile_dir"]} and offline mode is enabled')
+
+        response = _session.get(SETTINGS['local_url'].format(x=x, y=y, z=z), timeout=10)
+        response.raise_for_status()
+        return response.content
+
+    response = _session.get(SETTINGS['url'].format(x=x, y=y, z=z), timeout=30,
+                            headers={'User-Agent': 'izv-proj tile cache'})
+    response.raise_for_status()
+
+    with atomic_write(path) as tmpPath, open(tmpPath, 'wb') as f:
+        f.write(response.content)
+
+    return response.content
+
+
+@functools.lru_cache(maxsize=512)
+def _decode_tile(x: int, y: int, z: int) -> np.ndarray:
+    """
+    Return decoded tile as RGBA array, recently used tiles are kept in memory.
+    """
+    return np.asarray(Image.open(io.BytesIO(fetch_tile(x, y, z))).convert('RGBA'))
+
+
+def prefetch(west: float, south: float, east: float, north: float, zooms: list[int], workers: int = 8) -> int:
+    """
+    Download all tiles covering the bounding box to the tile directory.
+
+    :param west: Western longitude of the bounding box
+    :param south: Southern latitude of the bounding box
+    :param east: Eastern longitude of the bounding box
+    :param north: Northern latitude of the bounding box
+    :param zooms: Zoom levels of the tiles
+    :param workers: Number of concurrent downloads
+    :return: Number of tiles covering the bounding box
+    """
+    tiles = list(mercantile.tiles(west, south, east, north, zooms))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda tile: fetch_tile(tile.x, tile.y, tile.z), tiles))
+
+    return len(tiles)
+
+
+def _calculate_zoom(west: float, south: float, east: float, north: float) -> int:
+    """
+    Calculate zoom level for the bounding box in longitude and latitude (the same way as contextily does).
+    """
+    zoomLon = np.ceil(np.log2(360 * 2.0 / (east - west)))
+    zoomLat = np.ceil(np.log2(360 * 2.0 / (north - south)))
+    return int(min(zoomLon, zoomLat, MAX_ZOOM))
+
+
+def bounds2img(west: float, south: float, east: float, north: float, zoom: int) -> tuple[np.ndarray, tuple]:
+    """
+    Create image from tiles covering the bounding box in Web Mercator.
+
+    :param west: Minimal x coordinate of the bounding box
+    :param south: Minimal y coordinate of the bounding box
+    :param east: Maximal x coordinate of the bounding box
+    :param north: Maximal y coordinate of the bounding box
+    :param zoom: Zoom level of the tiles
+    :return: RGBA image and its extent (minX, maxX, minY, maxY) in Web Mercator
+    """
+    # Obtain tiles covering the bounding box
+    lonW, latS = mercantile.lnglat(west, south)
+    lonE, latN = mercantile.lnglat(east, north)
+    tiles = list(mercantile.tiles(lonW, latS, lonE, latN, [zoom]))
+    xs = sorted({tile.x for tile in tiles})
+    ys = sorted({tile.y for tile in tiles})
+
+    # Place each decoded tile to its position in the image
+    height, width, bands = _decode_tile(xs[0], ys[0], zoom).shape
+    image = np.zeros((len(ys) * height, len(xs) * width, bands), dtype=np.uint8)
+    for tile in tiles:
+        row = (tile.y - ys[0]) * height
+        column = (tile.x - xs[0]) * width
+        image[row:row + height, column:column + width] = _decode_tile(tile.x, tile.y, zoom)
+
+    # Extent of the image is given by the upper left and the lower right tile
+    upperLeft = mercantile.xy_bounds(xs[0], ys[0], zoom)
+    lowerRight = mercantile.xy_bounds(xs[-1], ys[-1], zoom)
+
+    return image, (upperLeft.left, lowerRight.right, lowerRight.bottom, upperLeft.top)
+
+
+def add_basemap(ax, crs: str = None, zoom: int | str = 'auto', alpha: float = 1.0, attribution: bool = True):
+    """
+    Add basemap to the axes from the tile cache, replacement of contextily.add_basemap.
+
+    :param ax: Matplotlib axes with the plotted data
+    :param crs: Coordinate reference system of the axes, Web Mercator if None
+    :param zoom: Zoom level of the tiles, calculated from the axes extent if 'auto'
+    :param alpha: Transparency of the basemap
+    :param attribution: If True, add attribution of the tile provider
+    """
+    xmin, xmax = ax.get_xlim()
+    ymin, ymax = ax.get_ylim()
+
+    # Obtain bounds of the axes in Web Mercator
+    west, south, east, north = xmin, ymin, xmax, ymax
+    if crs is not None and pyproj.CRS(crs) != pyproj.CRS('EPSG:3857'):
+        transformer = pyproj.Transformer.from_crs(crs, 'EPSG:3857', always_xy=True)
+        west, south, east, north = transformer.transform_bounds(xmin, ymin, xmax, ymax)
+
+    if zoom == 'auto':
+        zoom = _calculate_zoom(*pyproj.Transformer.from_crs('EPSG:3857', 'EPSG:4326', always_xy=True)
+                               .transform_bounds(west, south, east, north))
+
+    image, extent = bounds2img(west, south, east, north, zoom)
+
+    # Reproject the image to the coordinate system of the axes
+    if crs is not None and pyproj.CRS(crs) != pyproj.CRS('EPSG:3857'):
+        image, extent = contextily.warp_tiles(image, extent, t_crs=crs)
+
+    ax.imshow(image, extent=extent, interpolation='bilinear', alpha=alpha)
+
+    # Keep the original extent of the axes
+    ax.axis((xmin, xmax, ymin, ymax))
+
+    if attribution:
+        contextily.add_attribution(ax, SETTINGS['attribution'])
@@ -1,314 +1,838 @@
-#!/usr/bin/env python3.12
-# coding=utf-8
-# Author: Samuel Hejnicek, xhejni00
-
-from matplotlib import pyplot as plt
-import pandas as pd
-import seaborn as sns
-import numpy as np
-import zipfile
-
-
-def load_data(filename: str, ds: str) -> pd.DataFrame:
-    """
-    Concatenates specified .xls files from the given zip file
-    and returns them as a single dataframe
-    :param filename: string containing path to the zip file
-    :param ds: string containing the suffix of the files to be processed
-    :return: pandas dataframe containing the concatenated data
-    """
-
-    with zipfile.ZipFile(filename, 'r') as zipFile:
-
-        # Obtain a list of all files in the zip archive
-        fileList = zipFile.namelist()
-
-        # Filter only files with name in db argument ending with .xls
-        targetedFileNames = [file for file in fileList if file.endswith(f'{ds}.xls')]
-
-        df = []
-
-        # Obtain dataframe from each file and append it to the list
-        for file in targetedFileNames:
-            with zipFile.open(file) as f:
-                df.extend(pd.read_html(f, encoding="cp1250"))
-
-        # Concatenate all dataframes into one (ignore index for not using index values from original dataframes)
-        df = pd.concat(df, ignore_index=True)
-
-        # Drop unnamed columns containing NaN values
-        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-        return df
-
-
-def parse_data(df: pd.DataFrame, verbose: bool = False) -> pd.DataFrame:
-    """
-    Parses the given dataframe which is cleaned and filtered based on the task description
-    :param df: pandas dataframe to be processed
-    :param verbose: if True prints deep memory usage of the dataframe in megabytes
-    :return: pandas dataframe containing the modified data
-    """
-
-    # Define region dictionary for mapping
-    regions = {
-        0: "PHA", 1: "STC", 2: "JHC", 3: "PLK",
-        4: "ULK", 5: "HKK", 6: "JHM", 7: "MSK",
-        14: "OLK", 15: "ZLK", 16: "VYS", 17: "PAK",
-        18: "LBK", 19: "KVK"
-    }
-
-    # Create a new dataframe which is a copy of the original dataframe
-    newDf = df.copy()
-
-    # Create new column with date in datetime format
-    newDf["date"] = pd.to_datetime(newDf["p2a"], format="%d.%m.%Y", errors="coerce")
-
-    # Create new column with region name based on mapping
-    newDf["region"] = newDf["p4a"].map(regions)
-
-    # Drop all duplicates based on p1 column, based on the task description i decided to keep none of the duplicates
-    newDf = newDf.drop_duplicates(subset='p1', keep=False)
-
-    # If verbose, print deep memory usage of the dataframe
-    if verbose:
-        print(f'new_size={(newDf.memory_usage(deep=True).sum() / (1000 * 1000)):.1f} MB')
-    return newDf
-
-
-def plot_state(df: pd.DataFrame, fig_location: str = None, show_figure: bool = False):
-    """
-    Plots four barplots showing the number of accidents based on road state in each region
-    :param df: pandas dataframe containing the data
-    :param fig_location: string containing the path where the figure should be saved
-    :param show_figure: if True, shows the figure
-    """
-
-    # Define road states dictionary for mapping
-    roadStates = {
-        1: "povrch suchý",
-        2: "povrch suchý",
-        3: "povrch mokrý",
-        4: "na vozovce je bláto",
-        5: "na vozovce je náledí, ujetý sníh",
-        6: "na vozovce je náledí, ujetý sníh",
-    }
-
-    # Create new column with road state based on mapping
-    df["roadStates"] = df["p16"].map(roadStates)
-
-    # Create new subdataset using groupy and size functions
-    roadsWithRegions = df.groupby(["region", "roadStates"]).size().reset_index(name="count")
-
-    # Create 2x2 grid of subplots
-    fig, axes = plt.subplots(2, 2, figsize=(11, 9))
-
-    # Flatten the grid to a 1D array for iteration
-    axes = axes.flatten()
-
-    # Set the title of the figure
-    fig.suptitle("Počet nehod v jednotlivých krajích dle stavu vozovky")
-
-    # Obtain all unique road states
-    roadStateList = roadsWithRegions["roadStates"].unique()
-
-    """
-    For Mr. Mrazek: I decided to iterate over axes and plot new graph using barplot for every subplot.
-    I know it would be easier to use just sns.catplot and define colwrap parameter for example to produce less code,
-    but in that case i could not use hue in general for all subplots,
-    becsuse each subgraph have different number of accidents and hue would not reflect that correctly,
-    maybe there is an option of creating custom hue scale for each subgraph, but this option of iterating over axes
-    and plotting each subplot separately with its hue seemed more clear to me. Thanks for understanding.
-    """
-
-    # Iterate over all subplots (roadStates)
-    for i, axe in enumerate(axes):
-
-        # Obtain data for current road state
-        currentRoadState = roadsWithRegions[roadsWithRegions["roadStates"] == roadStateList[i]]
-
-        # Plot barplot for each subplot with a color palette and hue based on count
-        sns.barplot(data=currentRoadState, x="region", y="count", ax=axe, palette="crest", hue="count")
-
-        # Set the style of the plot and background color
-        sns.set_style("darkgrid")
-        axe.set_facecolor('#f0f0f0')
-
-        # Set the legend title and location
-        axe.legend(title="Počet", loc="upper left", fontsize="small")
-
-        # Set the title of the subplot based on road state
-        axe.set_title(f'Stav povrchu vozovky: {roadStateList[i]}')
-
-        # Rotate x axis labels for better readability
-        axe.tick_params(axis='x', rotation=45)
-
-        # Set labels for x and y axis based on subplot position
-        axe.set_xlabel("Kraj" if i >= 2 else "")
-        axe.set_ylabel("Počet nehod" if i % 2 == 0 else "")
-
-    # Use tight layout for better spacing
-    plt.tight_layout()
-
-    # Save the figure if location is provided
-    if fig_location:
-        plt.savefig(fig_location)
-
-    # If True, show the figure
-    if show_figure:
-        plt.show()
-
-
-def plot_alcohol(df: pd.DataFrame, df_consequences: pd.DataFrame,
-                 fig_location: str = None, show_figure: bool = False):
-    """
-    Plots four seaborn catplots showing the number of accidents
-    based on their consequences in each region where alcohol was involved
-    :param df: pandas dataframe containing data
-    :param df_consequences: pandas dataframe containing the consequences of accidents
-    :param fig_location: string containing the path where the figure should be saved
-    :param show_figure: if True, shows the figure
-    """
-
-    # Merge the dataframes based on p1 column with relation one to many
-    dfMerged = pd.merge(df, df_consequences, on="p1", validate="one_to_many")
-
-    # Define dictionary for mapping injury consequences
-    injury = {
-        1: "usmrcení",
-        2: "těžké zranění",
-        3: "lehké zranění",
-        4: "bez zranění",
-    }
-
-    # Create a column driver_hurt based on p59a column value (1 - driver, 2 - passenger)
-    dfMerged["driver_hurt"] = dfMerged["p59a"].apply(lambda x: "řidič" if x == 1 else "spolujezdec")
-
-    # Create a column consequences and map it based on injury dictionary
-    dfMerged["consequences"] = dfMerged["p59g"].map(injury)
-
-    # Create a new dataframe with only accidents where alcohol was involved
-    dfAlcoholOnly = dfMerged[dfMerged["p11"] >= 3]
-
-    # Aggregate the data based on region, consequences and driver_hurt columns
-    groupedDf = dfAlcoholOnly.groupby(["region", "consequences", "driver_hurt"]).size().reset_index(name="count")
-
-    # Create a catplot with 2x2 grid of subplots where each subplot represents a different consequence of the accident
-    g = sns.catplot(data=groupedDf, x="region", y="count", hue="driver_hurt", col="consequences", kind="bar", palette="tab10", col_wrap=2, sharey=False)
-
-    # Set the style of the plot
-    sns.set_style("darkgrid")
-
-    # Set the title of the figure
-    g.figure.suptitle("Počet nehod pod vlivem alkoholu v jednotlivých krajích dle následků nehody")
-
-    # Set the tittle of each subplot based on the consequence
-    g.set_titles("Následek nehody: {col_name}")
-
-    # Remove the legend title
-    g.legend.set_title("")
-
-    # Set the labels for x and y axis
-    g.set_xlabels("Kraj")
-    g.set_ylabels("Počet nehod")
-
-    # Rotate x axis labels for better readability
-    g.tick_params(axis='x', rotation=45)
-
-    # Use tight layout for better spacing
-    g.tight_layout()
-
-    # Save the figure if location is provided
-    if fig_location:
-        plt.savefig(fig_location)
-
-    # If True, show the figure
-    if show_figure:
-        plt.show()
-
-
-def plot_type(df: pd.DataFrame, fig_location: str = None,
-              show_figure: bool = False):
-    """
-    Plots a seaborn relplot showing the number of accidents in selected regions based on their type
-    :param df: pandas dataframe containing data
-    :param fig_location: string containing the path where the figure should be saved
-    :param show_figure: if True, shows the figure
-    """
-
-    # Filter only 4 chosen regions
-    dfFiltered = df[df["region"].isin(["OLK", "MSK", "JHM", "ZLK"])]
-
-    accidentType = {
-        1: "s jedoucím nekolejovým vozidlem",
-        2: "s vozidlem zaparkovaným nebo odstaveným",
-        3: "s pevnou překážkou",
-        4: "s chodcem",
-        5: "s lesní zvěří",
-        6: "s domácím zvířetem",
-        7: "s vlakem",
-        8: "s tramvají",
-    }
-
-    # Copy the dataframe to avoid SettingWithCopyWarning
-    dfFiltered = dfFiltered.copy()
-
-    # Map the accident type to the dataframe's new column
-    dfFiltered["accidentType"] = dfFiltered["p6"].map(accidentType)
-
-    # Create a pivot table with date and region as a multiindex
-    dfPivoted = pd.pivot_table(dfFiltered, index=["date", "region"], columns="accidentType", values="p6", aggfunc="count", fill_value=0)
-
-    # Use downsampling to get the data in monthly intervals
-    dfResampled = dfPivoted.groupby("region").resample("ME", level="date").sum()
-
-    # Stack the dataframe to get the data in the right format for plotting
-    dfToPlot = dfResampled.stack().reset_index(name="count")
-
-    # Create a relplot with "line" kind to plot the data in different regions
-    g = sns.relplot(data=dfToPlot, x="date", y="count", hue="accidentType", col="region", kind="line", palette="tab10", col_wrap=2)
-
-    # Move the legend to the right side of the subgraphs
-    sns.move_legend(g, "center right", title="Druh nehody", bbox_to_anchor=(1.26, 0.5))
-
-    # Set the title of the whole figure
-    g.figure.suptitle("Počet jednotlivých typů srážek ve vybraných krajích")
-
-    # Set the title of each subgraph
-    g.set_titles("Kraj: {col_name}")
-
-    # Set y axe label
-    g.set_ylabels("Počet nehod")
-
-    # Set the x axe labes to empty
-    g.set_xlabels("")
-
-    # Set the xtics with two months interval
-    xticks = pd.date_range(start='2023-01-01', end='2024-10-01', freq='2ME')
-
-    # Set the x axe limit for each subgraph and convert the xticks to the right format
-    for ax in g.axes.flat:
-        ax.set_xlim(pd.Timestamp("2023-01-01"), pd.Timestamp("2024-10-01"))
-        ax.tick_params(axis='x', labelbottom=True, rotation=45)
-        # Taken from IZV lectures to convert xticks to time from the preview
-        ax.set_xticks(xticks)
-        ax.set_xticklabels([pd.to_datetime(tm, unit='d').strftime('%m/%y') for tm in xticks])
-
-    # Use tight_layout to avoid overlapping of the subgraphs
-    plt.tight_layout()
-
-    # Save the figure if the location is given
-    if fig_location:
-        plt.savefig(fig_location, bbox_inches="tight")
-
-    # Show the figure if True
-    if show_figure:
-        plt.show()
-
-
-if __name__ == "__main__":
-    df = load_data("data_23_24.zip", "nehody")
-    df_consequences = load_data("data_23_24.zip", "nasledky")
-    df2 = parse_data(df, True)
-    plot_state(df2, "01_state.png")
-    plot_alcohol(df2, df_consequences, "02_alcohol.png", True)
-    plot_type(df2, "03_type.png")
\ No newline at end of file
+#!/usr/bin/env python3.12
+# coding=utf-8
+# Author: Samuel Hejnicek, xhejni00
+
+from matplotlib import pyplot as plt
+import pandas as pd
+import seaborn as sns
+import numpy as np
+import zipfile
+import io
+import os
+import glob
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+from query import Query
+from helpers import file_hash, decode_dates, write_parquet, store_cache
+
+# Filters of the accidents whose consequences are counted for plot_alcohol (alcohol was involved)
+ALCOHOL_FILTERS = [("p11", ">=", 3)]
+
+
+def _parse_member(filename: str, member: str) -> list[pd.DataFrame]:
+    """
+    Parses all html tables stored in one member of the zip file
+    :param filename: string containing path to the zip file
+    :param member: string containing name of the file inside the zip file
+    :return: list of pandas dataframes found in the member
+    """
+
+    # Read raw bytes of the member, every worker opens the archive on its own
+    with zipfile.ZipFile(filename, 'r') as zipFile:
+        data = zipFile.read(member)
+
+    return pd.read_html(io.BytesIO(data), encoding="cp1250")
+
+
+def _clean_tables(tables: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenates parsed tables and removes unnamed columns
+    :param tables: list of pandas dataframes parsed from the html files
+    :return: pandas dataframe containing the concatenated data
+    """
+
+    # Concatenate all dataframes into one (ignore index for not using index values from original dataframes)
+    df = pd.concat(tables, ignore_index=True)
+
+    # Drop unnamed columns containing NaN values
+    return df.loc[:, ~df.columns.str.contains('^Unnamed')]
+
+
+def _load_archives(filenames: list[str], ds_list: list[str], workers: int = None,
+                   cache_dir: str = None) -> dict[str, dict[str, pd.DataFrame]]:
+    """
+    Loads several datasets from each of the given zip files, members of all archives are parsed in one pool
+    :param filenames: list of strings containing paths to the zip files
+    :param ds_list: list of strings containing the suffixes of the files to be processed
+    :param workers: number of processes used for parsing the files, if None files are parsed serially
+    :param cache_dir: string containing path to the directory with parsed data in parquet format,
+                      if None the cache is not used
+    :return: dictionary mapping each archive to dictionary mapping each suffix to pandas dataframe
+    """
+
+    datasets = {filename: {} for filename in filenames}
+    cacheFiles = {filename: {} for filename in filenames}
+
+    # Return already parsed data if the archive with the same content was loaded before
+    if cache_dir:
+        for filename in filenames:
+            archiveHash = file_hash(filename)
+            for ds in ds_list:
+                cacheFiles[filename][ds] = os.path.join(cache_dir, f'{archiveHash}_{ds}.parquet')
+                if os.path.exists(cacheFiles[filename][ds]):
+                    datasets[filename][ds] = pd.read_parquet(cacheFiles[filename][ds])
+
+    # Obtain suffixes of each archive which were not found in the cache
+    missing = {filename: [ds for ds in ds_list if ds not in datasets[filename]] for filename in filenames}
+    tables = {(filename, ds): [] for filename in filenames for ds in missing[filename]}
+    if not tables:
+        return datasets
+
+    # Pair each .xls file with the archive and the suffix it belongs to
+    members = []
+    for filename in filenames:
+        if missing[filename]:
+            with zipfile.ZipFile(filename, 'r') as zipFile:
+                members.extend((filename, ds, file) for file in zipFile.namelist()
+                               for ds in missing[filename] if file.endswith(f'{ds}.xls'))
+
+    if workers:
+        # Parse each file of all archives in a separate process, map keeps the original order of the files
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = executor.map(_parse_member, [filename for filename, _, _ in members],
+                                  [file for _, _, file in members])
+            for (filename, ds, _), memberTables in zip(members, parsed):
+                tables[(filename, ds)].extend(memberTables)
+    else:
+        # Obtain dataframe from each file and append it to the list of its dataset
+        for filename in filenames:
+            with zipfile.ZipFile(filename, 'r') as zipFile:
+                for _, ds, file in (member for member in members if member[0] == filename):
+                    with zipFile.open(file) as f:
+                        tables[(filename, ds)].extend(pd.read_html(f, encoding="cp1250"))
+
+    for (filename, ds), dsTables in tables.items():
+        datasets[filename][ds] = _clean_tables(dsTables)
+
+        # Store parsed data for the next runs
+        if cache_dir:
+            store_cache(datasets[filename][ds], cacheFiles[filename][ds])
+
+    return datasets
+
+
+def load_datasets(filename: str, ds_list: list[str], workers: int = None,
+                  cache_dir: str = None) -> dict[str, pd.DataFrame]:
+    """
+    Loads several datasets from the given zip file using a single pass over the archive
+    :param filename: string containing path to the zip file
+    :param ds_list: list of strings containing the suffixes of the files to be processed
+    :param workers: number of processes used for parsing the files, if None files are parsed serially
+    :param cache_dir: string containing path to the directory with parsed data in parquet format,
+                      if None the cache is not used
+    :return: dictionary mapping each suffix to pandas dataframe containing the concatenated data
+    """
+
+    datasets = _load_archives([filename], ds_list, workers, cache_dir)[filename]
+
+    # Keep the order of the requested suffixes
+    return {ds: datasets[ds] for ds in ds_list}
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    """
+    Converts values to strings, integral floats are written without decimal part (1.0 as "1")
+    :param values: pandas series to be converted
+    :return: pandas series with strings, missing values are kept as NaN
+    """
+
+    if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+        values = values.astype("Int64")
+
+    return values.astype(str).where(values.notna())
+
+
+def _reconcile(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenates dataframes with slightly different columns into one with union of their columns,
+    column which is numeric in some dataframes and text in others is converted to numbers if all its values
+    are numbers and to strings otherwise, so each column has a single data type
+    :param frames: list of pandas dataframes
+    :return: pandas dataframe containing rows of all dataframes, missing columns are filled with NaN
+    """
+
+    # Union of the columns in the order of their first occurrence
+    columns = list(dict.fromkeys(column for df in frames for column in df.columns))
+
+    frames = list(frames)
+    for column in columns:
+        present = [index for index, df in enumerate(frames) if column in df.columns]
+        numeric = [pd.api.types.is_numeric_dtype(frames[index][column]) for index in present]
+
+        # Column with the same kind of values in all archives is left for concat to unify
+        if all(numeric) or not any(numeric):
+            continue
+
+        # All frames are converted first, so a column is never left partly numeric and partly text
+        try:
+            converted = [pd.to_numeric(frames[index][column]) for index in present]
+        except (TypeError, ValueError):
+            converted = [_as_text(frames[index][column]) for index in present]
+
+        # Only frames with a changed column are copied, the others are passed to concat as they are
+        for index, values in zip(present, converted):
+            frames[index] = frames[index].assign(**{column: values})
+
+    return pd.concat(frames, ignore_index=True).reindex(columns=columns)
+
+
+def load_archives(sources: str | list[str], ds_list: list[str], workers: int = None,
+                  cache_dir: str = None) -> dict[str, pd.DataFrame]:
+    """
+    Loads several datasets from several zip files (e.g. one archive per period) and merges them
+    :param sources: string containing glob pattern of the zip files (e.g. "data_*.zip") or list of paths
+    :param ds_list: list of strings containing the suffixes of the files to be processed
+    :param workers: number of processes used for parsing the files of all archives, if None files are parsed serially
+    :param cache_dir: string containing path to the directory with parsed data in parquet format,
+                      if None the cache is not used
+    :return: dictionary mapping each suffix to pandas dataframe containing the data of all archives
+             with union of their columns and source column with name of the archive of each row
+    """
+
+    filenames = sorted(glob.glob(sources)) if isinstance(sources, str) else list(sources)
+    if not filenames:
+        raise FileNotFoundError(f"No archives found for {sources}")
+
+    archives = _load_archives(filenames, ds_list, workers, cache_dir)
+
+    datasets = {}
+    for ds in ds_list:
+        frames = []
+        for filename in filenames:
+            # Record the archive each row comes from
+            frames.append(archives[filename][ds].assign(source=os.path.basename(filename)))
+
+        datasets[ds] = _reconcile(frames)
+        datasets[ds]["source"] = datasets[ds]["source"].astype("category")
+
+    return datasets
+
+
+def load_data(filename: str, ds: str, workers: int = None, cache_dir: str = None) -> pd.DataFrame:
+    """
+    Concatenates specified .xls files from the given zip file
+    and returns them as a single dataframe
+    :param filename: string containing path to the zip file
+    :param ds: string containing the suffix of the files to be processed
+    :param workers: number of processes used for parsing the files, if None files are parsed serially
+    :param cache_dir: string containing path to the directory with parsed data in parquet format,
+                      if None the cache is not used
+    :return: pandas dataframe containing the concatenated data
+    """
+
+    return load_datasets(filename, [ds], workers, cache_dir)[ds]
+
+
+def iter_data(filename: str, ds: str) -> Iterator[pd.DataFrame]:
+    """
+    Iterates over specified .xls files from the given zip file
+    and yields one dataframe per file, so the whole dataset is never held in memory
+    :param filename: string containing path to the zip file
+    :param ds: string containing the suffix of the files to be processed
+    :return: iterator of pandas dataframes, one for every processed file
+    """
+
+    with zipfile.ZipFile(filename, 'r') as zipFile:
+
+        # Parse files with name in db argument ending with .xls one by one
+        for file in zipFile.namelist():
+            if file.endswith(f'{ds}.xls'):
+                with zipFile.open(file) as f:
+                    yield _clean_tables(pd.read_html(f, encoding="cp1250"))
+
+
+def _prepare_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Creates a copy of the given dataframe with date and region columns
+    :param df: pandas dataframe to be processed
+    :return: pandas dataframe containing the new columns
+    """
+
+    # Define region dictionary for mapping
+    regions = {
+        0: "PHA", 1: "STC", 2: "JHC", 3: "PLK",
+        4: "ULK", 5: "HKK", 6: "JHM", 7: "MSK",
+        14: "OLK", 15: "ZLK", 16: "VYS", 17: "PAK",
+        18: "LBK", 19: "KVK"
+    }
+
+    # Create a new dataframe which is a copy of the original dataframe
+    newDf = df.copy()
+
+    # Create new column with date in datetime format
+    newDf["date"] = decode_dates(newDf["p2a"])["date"]
+
+    # Create new column with region name based on mapping
+    newDf["region"] = newDf["p4a"].map(regions)
+
+    return newDf
+
+
+def _compact_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduces memory usage of the parsed dataframe by dropping columns not used by the plots
+    and by using the smallest possible data types
+    :param df: pandas dataframe returned by _prepare_data
+    :return: pandas dataframe with compacted columns
+    """
+
+    # Keep only columns used in the plotting functions
+    usedColumns = ["p1", "p2a", "p4a", "p6", "p11", "p16", "date", "region"]
+    df = df[[column for column in usedColumns if column in df.columns]].copy()
+
+    for column in df.columns:
+        dtype = df[column].dtype
+
+        # Code columns contain only small integers, downcast them to int8/int16
+        if pd.api.types.is_integer_dtype(dtype):
+            df[column] = pd.to_numeric(df[column], downcast="integer")
+
+        # Code columns with missing values are stored as floats, integral ones are converted to nullable Int8/Int16
+        elif pd.api.types.is_float_dtype(dtype):
+            values = df[column].dropna()
+            if np.isfinite(values).all() and (values == values.round()).all():
+                smallest = pd.to_numeric(values.astype("int64"), downcast="integer").dtype
+                df[column] = df[column].astype(smallest.name.capitalize())
+            else:
+                df[column] = pd.to_numeric(df[column], downcast="float")
+
+        # Strings with only a few distinct values are stored as categories
+        elif pd.api.types.is_string_dtype(dtype) and df[column].nunique() < len(df) / 2:
+            df[column] = df[column].astype("category")
+
+    return df
+
+
+def parse_data(df: pd.DataFrame, verbose: bool = False, compact: bool = False) -> pd.DataFrame:
+    """
+    Parses the given dataframe which is cleaned and filtered based on the task description
+    :param df: pandas dataframe to be processed
+    :param verbose: if True prints deep memory usage of each column before and after parsing in megabytes
+    :param compact: if True drops columns not used by the plots and downcasts the remaining ones
+    :return: pandas dataframe containing the modified data
+    """
+
+    # Create date and region columns on a copy of the original dataframe
+    newDf = _prepare_data(df)
+
+    # Drop all duplicates based on p1 column, based on the task description i decided to keep none of the duplicates
+    newDf = newDf.drop_duplicates(subset='p1', keep=False)
+
+    # Use smaller data types if requested
+    if compact:
+        newDf = _compact_data(newDf)
+
+    # If verbose, print deep memory usage of each column and of the whole dataframe
+    if verbose:
+        report = pd.DataFrame({
+            "before": df.memory_usage(deep=True, index=False),
+            "after": newDf.memory_usage(deep=True, index=False),
+        }) / (1000 * 1000)
+        print(report.to_string(float_format=lambda size: f'{size:.2f}', na_rep="-"))
+        print(f'orig_size={(df.memory_usage(deep=True).sum() / (1000 * 1000)):.1f} MB')
+        print(f'new_size={(newDf.memory_usage(deep=True).sum() / (1000 * 1000)):.1f} MB')
+    return newDf
+
+
+def _part_file(store_dir: str, part: int) -> str:
+    """
+    Returns path to the file with one part of the ingested data
+    :param store_dir: string containing path to the directory with ingested data
+    :param part: number of the part
+    :return: string containing path to the part file
+    """
+
+    return os.path.join(store_dir, f'part_{part:05d}.parquet')
+
+
+def ingest_data(df: pd.DataFrame, store_dir: str) -> pd.DataFrame:
+    """
+    Appends new batch of data to the store with parsed data, the store always contains the same rows
+    as parse_data would return for all ingested batches together (no duplicates of p1 are kept)
+    :param df: pandas dataframe containing the new batch of data
+    :param store_dir: string containing path to the directory with ingested data
+    :return: pandas dataframe containing the rows of the new batch which were stored
+    """
+
+    os.makedirs(store_dir, exist_ok=True)
+    indexFile = os.path.join(store_dir, "index.parquet")
+
+    # Index contains number of occurrences of each p1 and the part where its row is stored (-1 for duplicates)
+    if os.path.exists(indexFile):
+        index = pd.read_parquet(indexFile).set_index("p1")
+    else:
+        index = pd.DataFrame({"count": pd.Series(dtype="int64"), "part": pd.Series(dtype="int64")},
+                             index=pd.Index([], dtype="int64", name="p1"))
+
+    # Create date and region columns for the new batch only
+    newDf = _prepare_data(df)
+
+    # Count occurrences of each p1 after adding the new batch
+    batchCounts = newDf["p1"].value_counts()
+    storedCounts = index["count"].reindex(batchCounts.index, fill_value=0)
+    totalCounts = storedCounts + batchCounts
+
+    # Stored rows whose p1 appears in the new batch become duplicates, remove them from their parts
+    stored = index.loc[storedCounts.index[storedCounts == 1]]
+    for part, removed in stored.groupby("part"):
+        partDf = pd.read_parquet(_part_file(store_dir, part))
+        partDf = partDf[~partDf["p1"].isin(removed.index)]
+        if partDf.empty:
+            os.remove(_part_file(store_dir, part))
+        else:
+            write_parquet(partDf, _part_file(store_dir, part))
+
+    # Keep only rows of the new batch which are not duplicates and store them as a new part
+    newPart = int(index["part"].max()) + 1 if len(index) else 0
+    newDf = newDf[newDf["p1"].map(totalCounts) == 1]
+    if not newDf.empty:
+        write_parquet(newDf, _part_file(store_dir, newPart))
+
+    # Update index for all p1 values of the new batch, write it last so the parts are always complete
+    updated = pd.DataFrame({
+        "count": totalCounts,
+        "part": np.where(totalCounts == 1, newPart, -1),
+    })
+    index = pd.concat([index.drop(updated.index, errors="ignore"), updated])
+    write_parquet(index.rename_axis("p1").reset_index(), indexFile)
+
+    return newDf
+
+
+def load_ingested(store_dir: str) -> pd.DataFrame:
+    """
+    Loads all data stored by ingest_data
+    :param store_dir: string containing path to the directory with ingested data
+    :return: pandas dataframe containing the parsed data without duplicates
+    """
+
+    # Parts are read in the order of ingestion to keep the original order of rows
+    partFiles = sorted(file for file in os.listdir(store_dir) if file.startswith("part_") and file.endswith(".parquet"))
+    if not partFiles:
+        return pd.DataFrame()
+
+    return pd.concat([pd.read_parquet(os.path.join(store_dir, file)) for file in partFiles], ignore_index=True)
+
+
+def _cube_groups(df: pd.DataFrame):
+    """
+    Groups accidents by the keys of the counts used by the plots (region, month, p16, p11, p6)
+    :param df: pandas dataframe returned by parse_data
+    :return: pandas groupby object, rows with missing values are kept as well
+    """
+
+    # Month is represented by its last day, the same labels are produced by monthly resampling
+    month = (df["date"] + pd.offsets.MonthEnd(0)).rename("month")
+
+    return df.groupby([df["region"], month, df["p16"], df["p11"], df["p6"]], dropna=False, observed=True)
+
+
+def build_cube(df: pd.DataFrame, df_consequences: pd.DataFrame = None,
+               consequence_filters: list[tuple] = ()) -> dict[str, pd.DataFrame]:
+    """
+    Counts accidents for all combinations of region, month and code columns used by the plots,
+    the plotting functions then only slice the counts instead of processing the whole dataframe
+    :param df: pandas dataframe returned by parse_data
+    :param df_consequences: pandas dataframe containing the consequences of accidents,
+                            if None counts for plot_alcohol are not computed
+    :param consequence_filters: list of filters (column, operator, value) applied to the accidents before
+                                they are merged with their consequences (e.g. ALCOHOL_FILTERS for plot_alcohol)
+    :return: dictionary with counts of accidents ("accidents") and of their consequences ("consequences")
+    """
+
+    # Count accidents for each combination of keys
+    cube = {
+        "accidents": _cube_groups(df).size().reset_index(name="count"),
+    }
+
+    if df_consequences is not None:
+        cube["consequences"] = _consequence_counts(df, df_consequences, consequence_filters)
+
+    return cube
+
+
+def _consequence_counts(df: pd.DataFrame, df_consequences: pd.DataFrame, filters: list[tuple] = ()) -> pd.DataFrame:
+    """
+    Counts consequences of accidents for each combination of region, month and code columns
+    :param df: pandas dataframe returned by parse_data
+    :param df_consequences: pandas dataframe containing the consequences of accidents
+    :param filters: list of filters (column, operator, value) applied to the accidents before merging
+    :return: pandas dataframe with region, month, p11, p59a, p59g and count columns
+    """
+
+    # Filters and selection of needed columns are applied to both tables before they are merged
+    query = Query(df)
+    for condition in filters:
+        query = query.filter(*condition)
+    dfMerged = query.join(Query(df_consequences), on="p1", validate="one_to_many") \
+                    .select("region", "date", "p11", "p59a", "p59g").collect()
+
+    # Month is represented by its last day as in the accidents counts
+    month = (dfMerged["date"] + pd.offsets.MonthEnd(0)).rename("month")
+
+    # Count consequences for each combination of keys
+    return dfMerged.groupby([dfMerged["region"], month, dfMerged["p11"], dfMerged["p59a"], dfMerged["p59g"]],
+                            dropna=False, observed=True).size().reset_index(name="count")
+
+
+def save_cube(cube: dict[str, pd.DataFrame], filename: str):
+    """
+    Saves counts created by build_cube, so the figures can be rendered without the original data
+    :param cube: dictionary returned by build_cube
+    :param filename: string containing path to the file (e.g. cube.pkl.gz)
+    """
+
+    pd.to_pickle(cube, filename)
+
+
+def load_cube(filename: str) -> dict[str, pd.DataFrame]:
+    """
+    Loads counts saved by save_cube
+    :param filename: string containing path to the file
+    :return: dictionary with counts in the same format as returned by build_cube
+    """
+
+    return pd.read_pickle(filename)
+
+
+def _state_counts(cube: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Counts accidents in each region based on road state
+    :param cube: dictionary returned by build_cube
+    :return: pandas dataframe with region, roadStates and count columns
+    """
+
+    # Define road states dictionary for mapping
+    roadStates = {
+        1: "povrch suchý",
+        2: "povrch suchý",
+        3: "povrch mokrý",
+        4: "na vozovce je bláto",
+        5: "na vozovce je náledí, ujetý sníh",
+        6: "na vozovce je náledí, ujetý sníh",
+    }
+
+    accidents = cube["accidents"]
+
+    # Map road states without modifying the cube
+    states = accidents["p16"].map(roadStates).rename("roadStates")
+
+    # Sum counts over all months and other code columns
+    return accidents.groupby([accidents["region"], states], observed=True)["count"].sum().reset_index(name="count")
+
+
+def _alcohol_counts(cube: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Counts consequences of accidents where alcohol was involved in each region
+    :param cube: dictionary returned by build_cube with consequences
+    :return: pandas dataframe with region, consequences, driver_hurt and count columns
+    """
+
+    # Keep only accidents where alcohol was involved
+    consequences = cube["consequences"]
+    consequences = consequences[consequences["p11"] >= 3]
+
+    # Define dictionary for mapping injury consequences
+    injury = {
+        1: "usmrcení",
+        2: "těžké zranění",
+        3: "lehké zranění",
+        4: "bez zranění",
+    }
+
+    # Create keys driver_hurt based on p59a column value (1 - driver, 2 - passenger) and consequences
+    driverHurt = pd.Series(np.where(consequences["p59a"] == 1, "řidič", "spolujezdec"),
+                           index=consequences.index, name="driver_hurt")
+    injuries = consequences["p59g"].map(injury).rename("consequences")
+
+    # Aggregate the data based on region, consequences and driver_hurt columns
+    return consequences.groupby([consequences["region"], injuries, driverHurt], observed=True)["count"] \
+                       .sum().reset_index(name="count")
+
+
+def _type_counts(cube: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Counts accidents of each type in selected regions in monthly intervals
+    :param cube: dictionary returned by build_cube
+    :return: pandas dataframe with region, date, accidentType and count columns
+    """
+
+    # Filter only 4 chosen regions
+    accidents = cube["accidents"]
+    dfFiltered = accidents[accidents["region"].isin(["OLK", "MSK", "JHM", "ZLK"])]
+
+    accidentType = {
+        1: "s jedoucím nekolejovým vozidlem",
+        2: "s vozidlem zaparkovaným nebo odstaveným",
+        3: "s pevnou překážkou",
+        4: "s chodcem",
+        5: "s lesní zvěří",
+        6: "s domácím zvířetem",
+        7: "s vlakem",
+        8: "s tramvají",
+    }
+
+    # Map the accident type and rename the month to date used in the plot
+    dfFiltered = dfFiltered.assign(accidentType=dfFiltered["p6"].map(accidentType)).rename(columns={"month": "date"})
+
+    # Create a pivot table with date and region as a multiindex
+    dfPivoted = pd.pivot_table(dfFiltered, index=["date", "region"], columns="accidentType", values="count", aggfunc="sum", fill_value=0, observed=True)
+
+    # Resampling fills months without any accident in the region
+    dfResampled = dfPivoted.groupby("region", observed=True).resample("ME", level="date").sum()
+
+    # Stack the dataframe to get the data in the right format for plotting
+    return dfResampled.stack().reset_index(name="count")
+
+
+def _sum_counts(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Sums partial counts computed for separate chunks of the data
+    :param frames: list of pandas dataframes with key columns and count column
+    :return: pandas dataframe with the same columns and counts summed over all frames
+    """
+
+    df = pd.concat(frames, ignore_index=True)
+    keys = [column for column in df.columns if column != "count"]
+    return df.groupby(keys, dropna=False, observed=True)["count"].sum().reset_index()
+
+
+def aggregate_chunks(filename: str, ds: str = "nehody", consequences_ds: str = None) -> dict[str, pd.DataFrame]:
+    """
+    Builds counts for all plots from the files of the zip file read one by one (see iter_data)
+    without holding the whole dataset in memory, each file is parsed only once and only partial counts,
+    p1 of each row with the position of its key in the partial counts and accidents with alcohol are kept
+    :param filename: string containing path to the zip file
+    :param ds: string containing the suffix of the files with accidents
+    :param consequences_ds: string containing the suffix of the files with the consequences of accidents,
+                            if None counts for plot_alcohol are not computed
+    :return: dictionary with counts in the same format as returned by build_cube
+    """
+
+    columns = ["p1", "p2a", "p4a", "p6", "p11", "p16"]
+    partialCounts = []
+    ids = []
+    rowKeys = []
+    alcoholAccidents = []
+    offset = 0
+
+    for chunk in iter_data(filename, ds):
+        df = _prepare_data(chunk[columns])
+
+        # Count accidents of the chunk and remember which partial count each row belongs to
+        groups = _cube_groups(df)
+        partialCounts.append(groups.size().reset_index(name="count"))
+        ids.append(df["p1"].to_numpy())
+        rowKeys.append(groups.ngroup().to_numpy() + offset)
+        offset += len(partialCounts[-1])
+
+        # Only accidents where alcohol was involved are needed for the consequences
+        alcoholAccidents.append(df.loc[df["p11"] >= 3, ["p1", "region", "date", "p11"]])
+
+    counts = pd.concat(partialCounts, ignore_index=True)
+
+    # Duplicates can be found only after all files are read, none of them is kept as parse_data does
+    ids = pd.Series(np.concatenate(ids))
+    duplicated = ids.duplicated(keep=False).to_numpy()
+    counts["count"] -= np.bincount(np.concatenate(rowKeys)[duplicated], minlength=len(counts))
+
+    cube = {"accidents": _sum_counts([counts[counts["count"] > 0]])}
+
+    if consequences_ds is not None:
+        dfAlcohol = pd.concat(alcoholAccidents, ignore_index=True)
+        dfAlcohol = dfAlcohol[~dfAlcohol["p1"].isin(ids[duplicated])]
+        cube["consequences"] = _sum_counts([_consequence_counts(dfAlcohol, chunk[["p1", "p59a", "p59g"]])
+                                            for chunk in iter_data(filename, consequences_ds)])
+
+    return cube
+
+
+def plot_state(df: pd.DataFrame, fig_location: str = None, show_figure: bool = False,
+               cube: dict[str, pd.DataFrame] = None):
+    """
+    Plots four barplots showing the number of accidents based on road state in each region
+    :param df: pandas dataframe containing the data
+    :param fig_location: string containing the path where the figure should be saved
+    :param show_figure: if True, shows the figure
+    :param cube: precomputed counts from build_cube or aggregate_chunks, if given df is not used
+    """
+
+    # Count accidents based on road state in each region
+    roadsWithRegions = _state_counts(build_cube(df) if cube is None else cube)
+
+    # Create 2x2 grid of subplots
+    fig, axes = plt.subplots(2, 2, figsize=(11, 9))
+
+    # Flatten the grid to a 1D array for iteration
+    axes = axes.flatten()
+
+    # Set the title of the figure
+    fig.suptitle("Počet nehod v jednotlivých krajích dle stavu vozovky")
+
+    # Obtain all unique road states
+    roadStateList = roadsWithRegions["roadStates"].unique()
+
+    """
+    For Mr. Mrazek: I decided to iterate over axes and plot new graph using barplot for every subplot.
+    I know it would be easier to use just sns.catplot and define colwrap parameter for example to produce less code,
+    but in that case i could not use hue in general for all subplots,
+    becsuse each subgraph have different number of accidents and hue would not reflect that correctly,
+    maybe there is an option of creating custom hue scale for each subgraph, but this option of iterating over axes
+    and plotting each subplot separately with its hue seemed more clear to me. Thanks for understanding.
+    """
+
+    # Iterate over all subplots (roadStates)
+    for i, axe in enumerate(axes):
+
+        # Obtain data for current road state
+        currentRoadState = roadsWithRegions[roadsWithRegions["roadStates"] == roadStateList[i]]
+
+        # Plot barplot for each subplot with a color palette and hue based on count
+        sns.barplot(data=currentRoadState, x="region", y="count", ax=axe, palette="crest", hue="count")
+
+        # Set the style of the plot and background color
+        sns.set_style("darkgrid")
+        axe.set_facecolor('#f0f0f0')
+
+        # Set the legend title and location
+        axe.legend(title="Počet", loc="upper left", fontsize="small")
+
+        # Set the title of the subplot based on road state
+        axe.set_title(f'Stav povrchu vozovky: {roadStateList[i]}')
+
+        # Rotate x axis labels for better readability
+        axe.tick_params(axis='x', rotation=45)
+
+        # Set labels for x and y axis based on subplot position
+        axe.set_xlabel("Kraj" if i >= 2 else "")
+        axe.set_ylabel("Počet nehod" if i % 2 == 0 else "")
+
+    # Use tight layout for better spacing
+    plt.tight_layout()
+
+    # Save the figure if location is provided
+    if fig_location:
+        plt.savefig(fig_location)
+
+    # If True, show the figure
+    if show_figure:
+        plt.show()
+
+
+def plot_alcohol(df: pd.DataFrame, df_consequences: pd.DataFrame,
+                 fig_location: str = None, show_figure: bool = False,
+                 cube: dict[str, pd.DataFrame] = None):
+    """
+    Plots four seaborn catplots showing the number of accidents
+    based on their consequences in each region where alcohol was involved
+    :param df: pandas dataframe containing data
+    :param df_consequences: pandas dataframe containing the consequences of accidents
+    :param fig_location: string containing the path where the figure should be saved
+    :param show_figure: if True, shows the figure
+    :param cube: precomputed counts from build_cube or aggregate_chunks, if given df and df_consequences are not used
+    """
+
+    # Count consequences of accidents where alcohol was involved in each region
+    if cube is None:
+        # Only accidents where alcohol was involved are merged with their consequences
+        cube = {"consequences": _consequence_counts(df, df_consequences, ALCOHOL_FILTERS)}
+
+    groupedDf = _alcohol_counts(cube)
+
+    # Create a catplot with 2x2 grid of subplots where each subplot represents a different consequence of the accident
+    g = sns.catplot(data=groupedDf, x="region", y="count", hue="driver_hurt", col="consequences", kind="bar", palette="tab10", col_wrap=2, sharey=False)
+
+    # Set the style of the plot
+    sns.set_style("darkgrid")
+
+    # Set the title of the figure
+    g.figure.suptitle("Počet nehod pod vlivem alkoholu v jednotlivých krajích dle následků nehody")
+
+    # Set the tittle of each subplot based on the consequence
+    g.set_titles("Následek nehody: {col_name}")
+
+    # Remove the legend title
+    g.legend.set_title("")
+
+    # Set the labels for x and y axis
+    g.set_xlabels("Kraj")
+    g.set_ylabels("Počet nehod")
+
+    # Rotate x axis labels for better readability
+    g.tick_params(axis='x', rotation=45)
+
+    # Use tight layout for better spacing
+    g.tight_layout()
+
+    # Save the figure if location is provided
+    if fig_location:
+        plt.savefig(fig_location)
+
+    # If True, show the figure
+    if show_figure:
+        plt.show()
+
+
+def plot_type(df: pd.DataFrame, fig_location: str = None,
+              show_figure: bool = False, cube: dict[str, pd.DataFrame] = None):
+    """
+    Plots a seaborn relplot showing the number of accidents in selected regions based on their type
+    :param df: pandas dataframe containing data
+    :param fig_location: string containing the path where the figure should be saved
+    :param show_figure: if True, shows the figure
+    :param cube: precomputed counts from build_cube or aggregate_chunks, if given df is not used
+    """
+
+    # Count accidents of each type in selected regions in monthly intervals
+    dfToPlot = _type_counts(build_cube(df) if cube is None else cube)
+
+    # Create a relplot with "line" kind to plot the data in different regions
+    g = sns.relplot(data=dfToPlot, x="date", y="count", hue="accidentType", col="region", kind="line", palette="tab10", col_wrap=2)
+
+    # Move the legend to the right side of the subgraphs
+    sns.move_legend(g, "center right", title="Druh nehody", bbox_to_anchor=(1.26, 0.5))
+
+    # Set the title of the whole figure
+    g.figure.suptitle("Počet jednotlivých typů srážek ve vybraných krajích")
+
+    # Set the title of each subgraph
+    g.set_titles("Kraj: {col_name}")
+
+    # Set y axe label
+    g.set_ylabels("Počet nehod")
+
+    # Set the x axe labes to empty
+    g.set_xlabels("")
+
+    # Set the xtics with two months interval
+    xticks = pd.date_range(start='2023-01-01', end='2024-10-01', freq='2ME')
+
+    # Set the x axe limit for each subgraph and convert the xticks to the right format
+    for ax in g.axes.flat:
+        ax.set_xlim(pd.Timestamp("2023-01-01"), pd.Timestamp("2024-10-01"))
+        ax.tick_params(axis='x', labelbottom=True, rotation=45)
+        # Taken from IZV lectures to convert xticks to time from the preview
+        ax.set_xticks(xticks)
+        ax.set_xticklabels([pd.to_datetime(tm, unit='d').strftime('%m/%y') for tm in xticks])
+
+    # Use tight_layout to avoid overlapping of the subgraphs
+    plt.tight_layout()
+
+    # Save the figure if the location is given
+    if fig_location:
+        plt.savefig(fig_location, bbox_inches="tight")
+
+    # Show the figure if True
+    if show_figure:
+        plt.show()
+
+
+if __name__ == "__main__":
+    datasets = load_datasets("data_23_24.zip", ["nehody", "nasledky"])
+    df = datasets["nehody"]
+    df_consequences = datasets["nasledky"]
+    df2 = parse_data(df, True)
+    cube = build_cube(df2, df_consequences, ALCOHOL_FILTERS)
+    plot_state(df2, "01_state.png", cube=cube)
+    plot_alcohol(df2, df_consequences, "02_alcohol.png", True, cube=cube)
+    plot_type(df2, "03_type.png", cube=cube)
\ No newline at end of file
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3.12
+# coding=utf-8
+# Author: Samuel Hejnicek, xhejni00
+
+import os
+import hashlib
+import contextlib
+import tempfile
+import pandas as pd
+from typing import Iterator
+
+
+def file_hash(filename: str) -> str:
+    """
+    Computes sha256 hash of the file content
+    :param filename: string containing path to the file
+    :return: string containing hexadecimal digest of the file
+    """
+
+    digest = hashlib.sha256()
+
+    # Read the file in blocks to avoid loading the whole archive into memory
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def atomic_write(path: str) -> Iterator[str]:
+    """
+    Provides path to a temporary file which replaces the file at the given path when the block finishes,
+    so readers never see a partially written file, the temporary file is removed if the block fails,
+    each writer gets its own temporary file so concurrent writers of the same path do not collide
+    :param path: string containing path to the file
+    :return: string containing path to the temporary file to be written
+    """
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    handle, tmpPath = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    os.close(handle)
+
+    try:
+        yield tmpPath
+        os.replace(tmpPath, path)
+    finally:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+
+
+def write_parquet(df: pd.DataFrame, path: str):
+    """
+    Writes dataframe to parquet file atomically
+    :param df: pandas dataframe to be stored
+    :param path: string containing path to the file
+    """
+
+    with atomic_write(path) as tmpPath:
+        df.to_parquet(tmpPath, index=False)
+
+
+def store_cache(df: pd.DataFrame, cacheFile: str):
+    """
+    Stores dataframe to the cache in parquet format, data which can not be stored are just not cached
+    :param df: pandas dataframe to be stored
+    :param cacheFile: string containing path to the cache file
+    """
+
+    try:
+        write_parquet(df, cacheFile)
+    except (TypeError, ValueError):
+        # Columns with mixed types can not be stored in parquet
+        pass
+
+
+def decode_dates(dates: pd.Series) -> pd.DataFrame:
+    """
+    Converts dates in format dd.mm.yyyy to datetime, each distinct string is parsed only once
+    :param dates: pandas series containing dates as strings (e.g. p2a column)
+    :return: pandas dataframe with date, year, month and weekday columns, invalid dates are NaT/NaN
+    """
+
+    # Replace each date with an integer code of its distinct value (missing values get code -1)
+    codes, uniques = pd.factorize(dates)
+
+    # Parse only distinct values, the last item is used for missing values
+    uniqueDates = pd.Series(pd.to_datetime(pd.Series(uniques, dtype=object), format="%d.%m.%Y", errors="coerce"))
+    uniqueDates = pd.concat([uniqueDates, pd.Series([pd.NaT])], ignore_index=True)
+
+    # Broadcast parsed values back to all rows using the codes
+    return pd.DataFrame({
+        "date": uniqueDates.to_numpy()[codes],
+        "year": uniqueDates.dt.year.to_numpy()[codes],
+        "month": uniqueDates.dt.month.to_numpy()[codes],
+        "weekday": uniqueDates.dt.weekday.to_numpy()[codes],
+    }, index=dates.index)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3.12
+# coding=utf-8
+# Author: Samuel Hejnicek, xhejni00
+
+import operator
+import pandas as pd
+
+# Supported filter operators, each gets a column and a value and returns a boolean mask
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "isin": lambda column, values: column.isin(values),
+    "notna": lambda column, _: column.notna(),
+}
+
+
+class Query:
+    """
+    Lazy query over pandas dataframes (e.g. accidents, consequences and locations tables).
+    Filters, projections and joins are only recorded, collect pushes filters and column pruning
+    below the joins before running them, so only the needed rows and columns are merged.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        :param df: pandas dataframe the query reads from
+        """
+        self._df = df
+        self._filters = []
+        self._columns = None
+        self._joins = []
+
+    def _copy(self) -> "Query":
+        """
+        Create a copy of the query, so the recorded operations are never shared between queries
+        """
+        query = Query(self._df)
+        query._filters = list(self._filters)
+        query._columns = None if self._columns is None else list(self._columns)
+        query._joins = list(self._joins)
+        return query
+
+    def filter(self, column: str, op: str, value=None) -> "Query":
+        """
+        Record a filter keeping rows where the column satisfies the condition.
+
+        :param column: name of the filtered column
+        :param op: operator from OPERATORS (e.g. ">=", "isin", "notna")
+        :param value: value the column is compared with, not used for "notna"
+        :return: new query with the filter
+        """
+        if op not in OPERATORS:
+            raise ValueError(f'Unsupported operator: {op}')
+
+        query = self._copy()
+        query._filters.append((column, op, value))
+        return query
+
+    def select(self, *columns: str) -> "Query":
+        """
+        Record a projection to the given columns.
+
+        :param columns: names of the columns in the result
+        :return: new query with the projection
+        """
+        query = self._copy()
+        query._columns = list(columns)
+        return query
+
+    def join(self, other: "Query", on: str, how: str = "inner", validate: str = None) -> "Query":
+        """
+        Record a join with another query (arguments have the same meaning as in pandas.merge).
+
+        :param other: query which is joined to this one
+        :param on: name of the column used for joining
+        :param how: type of the join ("inner" or "left")
+        :param validate: checked relation of the join (e.g. "one_to_many")
+        :return: new query with the join
+        """
+        query = self._copy()
+        query._joins.append((other, on, how, validate))
+        return query
+
+    def available_columns(self) -> list[str]:
+        """
+        Return names of the columns the query would produce without any further projection.
+        """
+        if self._columns is not None:
+            return list(self._columns)
+
+        columns = list(self._df.columns)
+        for other, _, _, _ in self._joins:
+            columns += [column for column in other.available_columns() if column not in columns]
+        return columns
+
+    def collect(self, needed: set[str] = None) -> pd.DataFrame:
+        """
+        Run the recorded operations and return the result.
+
+        :param needed: names of the columns required by the caller, if None all columns are returned
+        :return: pandas dataframe with the result of the query
+        """
+        # Columns in the result of this query
+        output = self._columns
+        if needed is not None:
+            output = [column for column in (output or self.available_columns()) if column in needed]
+
+        # Columns which must be read from the sources (result, filters and join keys)
+        required = None
+        if output is not None:
+            required = set(output) | {column for column, _, _ in self._filters} | {on for _, on, _, _ in self._joins}
+
+        # Assign each filter to the base dataframe or to an inner join, otherwise apply it after the joins
+        baseFilters = []
+        joinFilters = [[] for _ in self._joins]
+        lateFilters = []
+        for condition in self._filters:
+            column = condition[0]
+            pushed = False
+
+            if column in self._df.columns:
+                baseFilters.append(condition)
+                pushed = True
+
+            for i, (other, on, how, _) in enumerate(self._joins):
+                # Filters on the joining column are pushed to both sides of an inner join
+                if how == "inner" and column in other.available_columns() and (not pushed or column == on):
+                    joinFilters[i].append(condition)
+                    pushed = True
+
+            if not pushed:
+                lateFilters.append(condition)
+
+        # Read only rows satisfying the filters and only required columns from the base dataframe
+        mask = pd.Series(True, index=self._df.index)
+        for column, op, value in baseFilters:
+            mask &= OPERATORS[op](self._df[column], value)
+        baseColumns = [column for column in self._df.columns if required is None or column in required]
+        df = self._df.loc[mask, baseColumns]
+
+        # Run each join on already filtered and pruned inputs
+        for (other, on, how, validate), filters in zip(self._joins, joinFilters):
+            for condition in filters:
+                other = other.filter(*condition)
+            right = other.collect(None if required is None else required | {on})
+            df = pd.merge(df, right, on=on, how=how, validate=validate)
+
+        # Apply filters which could not be pushed below the joins
+        for column, op, value in lateFilters:
+            df = df[OPERATORS[op](df[column], value)]
+
+        return df if output is None else df[output]
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3.12
+# coding=utf-8
+# Author: Samuel Hejnicek, xhejni00
+
+import os
+import sys
+import time
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+from matplotlib import pyplot as plt
+
+# Directories of all parts of the project
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PARTS = [os.path.join(ROOT, part) for part in ("partOne", "partTwo", "partThree")]
+
+
+def _init_worker():
+    """
+    Prepare worker process for rendering figures without a display.
+    """
+    # Use non-interactive backend, figures are only saved to files
+    matplotlib.use("Agg")
+
+    # Make modules from all parts of the project importable
+    sys.path.extend(PARTS)
+
+
+def _run_job(cwd: str, module: str, function: str, args: tuple, kwargs: dict) -> float:
+    """
+    Render one figure by calling given function in the worker process.
+
+    :param cwd: Directory where the figure is saved (relative paths are resolved against it)
+    :param module: Name of the module with the plotting function
+    :param function: Name of the plotting function
+    :param args: Positional arguments of the function
+    :param kwargs: Keyword arguments of the function
+    :return: Time of rendering in seconds
+    """
+    os.chdir(cwd)
+    start = time.perf_counter()
+    getattr(importlib.import_module(module), function)(*args, **kwargs)
+
+    # Release the figures, so the next job in this worker starts with a clean pyplot state
+    plt.close("all")
+    return time.perf_counter() - start
+
+
+def render(jobs: list[tuple], workers: int = None) -> dict[str, float]:
+    """
+    Render figures in parallel worker processes.
+
+    :param jobs: List of jobs (name, cwd, module, function, args, kwargs)
+    :param workers: Number of worker processes, if None number of CPUs is used
+    :return: Dictionary mapping name of each figure to time of its rendering in seconds
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {name: executor.submit(_run_job, cwd, module, function, args, kwargs)
+                   for name, cwd, module, function, args, kwargs in jobs}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def figure_jobs() -> list[tuple]:
+    """
+    Prepare jobs for all figures of the project. Data are loaded and preprocessed once here,
+    each job gets only the part of the data its plotting function uses.
+
+    :return: List of jobs for the render function
+    """
+    sys.path.extend(PARTS)
+    partOne, partTwo, partThree = PARTS
+
+    # Figures of the first part do not need any data
+    jobs = [
+        ("generate_graph", partOne, "part01", "generate_graph", ([7, 4, 3], False, "generate_graph.png"), {}),
+        ("generate_sinus", partOne, "part01", "generate_sinus", (False, "generate_sinus.png"), {}),
+    ]
+
+    # Figures of the second part are rendered from the precomputed counts
+    if os.path.exists(os.path.join(partTwo, "data_23_24.zip")):
+        import analysis
+
+        datasets = analysis.load_datasets(os.path.join(partTwo, "data_23_24.zip"), ["nehody", "nasledky"])
+        cube = analysis.build_cube(analysis.parse_data(datasets["nehody"]), datasets["nasledky"],
+                                   analysis.ALCOHOL_FILTERS)
+        jobs += [
+            ("01_state", partTwo, "analysis", "plot_state", (None, "01_state.png"), {"cube": cube}),
+            ("02_alcohol", partTwo, "analysis", "plot_alcohol", (None, None, "02_alcohol.png"), {"cube": cube}),
+            ("03_type", partTwo, "analysis", "plot_type", (None, "03_type.png"), {"cube": cube}),
+        ]
+    else:
+        print("data_23_24.zip not found, figures of the second part are skipped")
+
+    # Figures of the third part get only the filtered rows and columns they plot
+    if any(os.path.exists(os.path.join(partThree, f'accidents{suffix}')) for suffix in (".feather", ".pkl.gz")):
+        import geo
+        import doc
+        from dataset import dataset_path, read_dataset
+
+        df_accidents = read_dataset("accidents", directory=partThree)
+        df_locations = read_dataset("locations", ["p1", "d", "e"], directory=partThree)
+        gdf = geo.make_geo(df_accidents, df_locations, geo.geo_cache_file(
+            os.path.join(partThree, "cache"),
+            dataset_path("accidents", partThree),
+            dataset_path("locations", partThree),
+        ))
+        projected = [column for columns in geo.PROJECTED_COLUMNS.values() for column in columns if column in gdf.columns]
+
+        # Figures of the report are created from the computed counts
+        stats = doc.compute_statistics(df_accidents[doc.STATISTICS_COLUMNS])
+
+        jobs += [
+            ("geo1", partThree, "geo", "plot_geo", (gdf.loc[gdf["p11"] >= 4, ["p11", "p2a", "geometry"] + projected], "geo1.png"), {}),
+            ("geo2", partThree, "geo", "plot_cluster", (gdf.loc[gdf["p10"] == 4, ["p1", "p10", "geometry"] + projected], "geo2.png"), {}),
+            ("fig1", partThree, "doc", "plot_animal_hours", (stats,), {}),
+            ("fig2", partThree, "doc", "plot_animal_type", (stats,), {}),
+        ]
+    else:
+        print("accidents data not found, figures of the third part are skipped")
+
+    return jobs
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    timings = render(figure_jobs())
+
+    # Report rendering time of each figure
+    for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+        print(f'{name:<16}{seconds:8.2f} s')
+    print(f'{"total":<16}{time.perf_counter() - start:8.2f} s')